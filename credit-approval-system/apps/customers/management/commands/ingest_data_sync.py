@@ -3,25 +3,31 @@ from apps.utils.data_ingestion import ingest_customer_data, ingest_loan_data
 import os
 
 class Command(BaseCommand):
-    help = 'Ingest customer and loan data from Excel files synchronously'
+    help = 'Ingest customer and loan data from Excel, CSV or Parquet files synchronously'
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser):
         # Use the correct path for data files in Docker container
-        customer_file = 'data/customer_data.xlsx'
-        loan_file = 'data/loan_data.xlsx'
+        parser.add_argument('--customer-file', default='data/customer_data.xlsx', help='Customer data file')
+        parser.add_argument('--loan-file', default='data/loan_data.xlsx', help='Loan data file')
+        parser.add_argument('--chunk-size', type=int, help='Rows written per batch (defaults to INGESTION_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        customer_file = options['customer_file']
+        loan_file = options['loan_file']
 
         self.stdout.write('Starting data ingestion...')
         
         if os.path.exists(customer_file):
             self.stdout.write('Ingesting customer data...')
-            ingest_customer_data(customer_file)
+            ingest_customer_data(customer_file, chunk_size)
             self.stdout.write(self.style.SUCCESS('✅ Customer data ingestion completed'))
         else:
             self.stdout.write(self.style.ERROR(f'❌ Customer file not found: {customer_file}'))
 
         if os.path.exists(loan_file):
             self.stdout.write('Ingesting loan data...')
-            ingest_loan_data(loan_file)
+            ingest_loan_data(loan_file, chunk_size)
             self.stdout.write(self.style.SUCCESS('✅ Loan data ingestion completed'))
         else:
             self.stdout.write(self.style.ERROR(f'❌ Loan file not found: {loan_file}'))
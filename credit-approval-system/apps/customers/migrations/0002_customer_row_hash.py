@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='row_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_reported_debt(apps, schema_editor):
+    # Until now current_debt held the file's value as is
+    Customer = apps.get_model('customers', 'Customer')
+    Customer.objects.update(opening_debt=F('current_debt'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customer_row_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='opening_debt',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.RunPython(copy_reported_debt, migrations.RunPython.noop),
+    ]
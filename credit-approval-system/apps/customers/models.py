@@ -12,7 +12,12 @@ class Customer(models.Model):
     )
     monthly_salary = models.DecimalField(max_digits=12, decimal_places=2)
     approved_limit = models.DecimalField(max_digits=15, decimal_places=2)
+    # Debt reported by the customer file, owed outside this system
+    opening_debt = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # opening_debt plus the principal of the customer's loans not yet rolled off
     current_debt = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    # Content hash of the ingested source row; empty for customers registered through the API
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
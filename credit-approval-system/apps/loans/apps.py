@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class LoansConfig(AppConfig):
+    name = 'apps.loans'
+    label = 'loans'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Connects the per-request query counter before any connection opens
+        from apps.utils import metrics  # noqa: F401
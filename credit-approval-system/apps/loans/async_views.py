@@ -0,0 +1,127 @@
+"""
+Native async versions of the read-heavy endpoints, for serving under ASGI
+(credit_system/asgi.py).
+
+They return byte-for-byte the same JSON as their DRF counterparts in
+views.py and share their cache entries, but await the database through
+Django's async ORM instead of holding a worker thread while it runs.
+"""
+import json
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from apps.utils.cache import aget_versions, aread_through, customer_version_key, get_cache, loan_version_key, record
+from apps.utils.db_router import areplica_reads
+from apps.utils.renderers import json_response
+from .models import Customer
+from .scoring import acached_credit_score
+from .serializers import LoanEligibilitySerializer
+from .views import (
+    DECISIONS, add_page_headers, decision_key, loan_detail_payload, loan_detail_queryset, loan_owner_queryset,
+    loan_page_payload, loan_page_queryset, parse_page_params, quote_decision,
+)
+
+_renderer = JSONRenderer()
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    """The response DRF's Response would produce for a JSON client"""
+    if settings.FAST_JSON_RENDERING:
+        return json_response(data, status_code)
+    return HttpResponse(_renderer.render(data), status=status_code, content_type='application/json')
+
+
+def method_not_allowed(request, allowed):
+    response = render({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+    response['Allow'] = ', '.join(allowed)
+    return response
+
+
+async def check_eligibility(request):
+    if request.method != 'POST':
+        return method_not_allowed(request, ['POST', 'OPTIONS'])
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError as e:
+        return render({'detail': f'JSON parse error - {e}'}, status.HTTP_400_BAD_REQUEST)
+
+    serializer = LoanEligibilitySerializer(data=payload)
+    if not serializer.is_valid():
+        return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    version_key = customer_version_key(data['customer_id'])
+    key = decision_key(data, (await aget_versions([version_key]))[version_key])
+    decision = DECISIONS.get(key)
+    if decision is None:
+        async with areplica_reads([version_key]):
+            try:
+                customer = await Customer.objects.aget(customer_id=data['customer_id'])
+            except Customer.DoesNotExist:
+                return render({'error': 'Customer not found'}, status.HTTP_404_NOT_FOUND)
+            decision = quote_decision(customer, await acached_credit_score(customer), data)
+        DECISIONS.set(key, decision)
+
+    return render(decision['eligibility'])
+
+
+# Like DRF's api_view, these are API endpoints without CSRF protection.
+# csrf_exempt itself is not async-aware in Django 4.2, so set its marker.
+check_eligibility.csrf_exempt = True
+
+
+async def view_loan(request, loan_id):
+    if request.method != 'GET':
+        return method_not_allowed(request, ['GET', 'OPTIONS'])
+
+    # Same entry layout and validation as views.view_loan
+    cache = get_cache()
+    cache_key = f'view_loan:{loan_id}'
+    loan_key = loan_version_key(loan_id)
+    entry = await cache.aget(cache_key)
+    if entry is not None:
+        customer_id = entry['customer_id']
+        versions = await aget_versions([loan_key, customer_version_key(customer_id)])
+        if versions == entry['versions']:
+            record('view_loan', hit=True)
+            return render(entry['data'])
+    record('view_loan', hit=False)
+
+    async with areplica_reads([loan_key]):
+        if entry is None:
+            customer_id = await loan_owner_queryset(loan_id).afirst()
+            if customer_id is None:
+                return render({'error': 'Loan not found'}, status.HTTP_404_NOT_FOUND)
+            versions = await aget_versions([loan_key, customer_version_key(customer_id)])
+        loan = await loan_detail_queryset(loan_id).afirst()
+    if loan is None:
+        return render({'error': 'Loan not found'}, status.HTTP_404_NOT_FOUND)
+
+    owner, data = loan_detail_payload(loan)
+    if owner == customer_id:
+        await cache.aset(cache_key, {'customer_id': owner, 'versions': versions, 'data': data}, settings.API_CACHE_TTL)
+    else:
+        await cache.adelete(cache_key)
+    return render(data)
+
+
+async def view_loans(request, customer_id):
+    if request.method != 'GET':
+        return method_not_allowed(request, ['GET', 'OPTIONS'])
+    try:
+        cursor, page_size = parse_page_params(request.GET)
+    except ValueError:
+        return render({'error': 'cursor and page_size must be integers'}, status.HTTP_400_BAD_REQUEST)
+
+    async def load_page():
+        rows = [row async for row in loan_page_queryset(customer_id, cursor, page_size)]
+        return loan_page_payload(rows, page_size)
+
+    version_key = customer_version_key(customer_id)
+    version = (await aget_versions([version_key]))[version_key]
+    async with areplica_reads([version_key]):
+        page = await aread_through(
+            'view_loans', f'view_loans:{customer_id}:{version}:{cursor}:{page_size}', load_page
+        )
+    return add_page_headers(render(page['loans']), request.path, page, page_size)
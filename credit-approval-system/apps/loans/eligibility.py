@@ -0,0 +1,92 @@
+from decimal import Decimal
+import numpy as np
+from apps.utils.amortization import monthly_installment, monthly_installments
+
+# Rows whose EMI may land within float64 error of a half-cent are
+# re-evaluated with the Decimal path, so the error can never change the
+# rounding. The error grows with the EMI, the tenure and, as (1+r)^n - 1
+# cancels, with how close the rate is to zero; FLOAT_ERROR_SAFETY covers
+# what that first-order estimate leaves out, HALF_CENT_TOLERANCE (in
+# cents) is the floor.
+HALF_CENT_TOLERANCE = 1e-4
+FLOAT_ERROR_SAFETY = 8
+
+
+def eligibility_decision(credit_score, monthly_emi, monthly_salary, interest_rate):
+    """Return (approval, corrected_interest_rate) for a quote"""
+    approval = False
+    corrected_interest_rate = interest_rate
+
+    if credit_score > 50:
+        if monthly_emi <= monthly_salary * Decimal('0.5'):
+            approval = True
+            if credit_score > 75:
+                corrected_interest_rate = 10.0
+            elif credit_score > 50:
+                corrected_interest_rate = 12.0
+            else:
+                corrected_interest_rate = 16.0
+    elif credit_score > 30:
+        corrected_interest_rate = 16.0
+        if monthly_emi <= monthly_salary * Decimal('0.5'):
+            approval = True
+
+    return approval, corrected_interest_rate
+
+
+def evaluate_quotes(loan_amounts, interest_rates, tenures, credit_scores, monthly_salaries):
+    """
+    Vectorized eligibility for many quotes.
+
+    Takes parallel sequences (Decimals for money and rates) and returns
+    lists of (monthly_installment, approval, corrected_interest_rate) that
+    are identical to what monthly_installment/eligibility_decision produce
+    one quote at a time.
+    """
+    rate = np.array(interest_rates, dtype=np.float64)
+    score = np.array(credit_scores, dtype=np.int64)
+    half_salary = np.array([salary * Decimal('0.5') for salary in monthly_salaries], dtype=np.float64)
+
+    emi = monthly_installments(loan_amounts, interest_rates, tenures)
+
+    cents = emi * 100
+    near_half_cent = np.abs(cents - np.floor(cents) - 0.5) < float_error_cents(cents, rate, tenures)
+    emi = np.round(cents) / 100
+
+    affordable = emi <= half_salary
+    approval = np.where(score > 50, affordable, (score > 30) & affordable)
+    corrected = np.where(
+        score > 75, 10.0, np.where(score > 50, 12.0, np.where(score > 30, 16.0, rate))
+    )
+    corrected = np.where((score > 50) & ~affordable, rate, corrected)
+
+    # Float comparison is only ambiguous when both sides round to the same double
+    exact = near_half_cent | (emi == half_salary) | ~np.isfinite(emi)
+
+    emis = emi.tolist()
+    approvals = approval.tolist()
+    corrected_rates = corrected.tolist()
+    for i in np.flatnonzero(exact):
+        emis[i] = float(monthly_installment(loan_amounts[i], interest_rates[i], tenures[i]))
+        approved, corrected_rate = eligibility_decision(
+            credit_scores[i], emis[i], monthly_salaries[i], interest_rates[i]
+        )
+        approvals[i] = approved
+        corrected_rates[i] = float(corrected_rate)
+    return emis, approvals, corrected_rates
+
+
+def float_error_cents(cents, interest_rates, tenures):
+    """
+    Upper estimate, in cents, of the float64 error in monthly_installments'
+    EMIs; at least HALF_CENT_TOLERANCE
+    """
+    monthly_rate = np.asarray(interest_rates, dtype=np.float64) / (12 * 100)
+    tenure = np.asarray(tenures, dtype=np.float64)
+    eps = np.finfo(np.float64).eps
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + monthly_rate) ** tenure
+        # (1+r)^n carries about n roundings; subtracting 1 magnifies them
+        relative = np.where(monthly_rate == 0, 2.0, (tenure + 4) * growth / (growth - 1)) * eps
+    error = np.abs(cents) * relative * FLOAT_ERROR_SAFETY
+    return np.fmax(np.nan_to_num(error, nan=np.inf), HALF_CENT_TOLERANCE)
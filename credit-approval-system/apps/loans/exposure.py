@@ -0,0 +1,152 @@
+"""
+Customers' current debt and active principal, maintained incrementally.
+
+A loan counts towards its customer's exposure until it is rolled off:
+at ingestion when it has already ended, otherwise by roll_off_matured
+once its end date has passed. Customer.current_debt is the opening debt
+from the customer file plus that active principal, which the credit
+profile keeps as active_loan_amount. New loans add to both in the
+transaction that creates them (scoring.record_loan), ingestion
+recomputes both for the customers it touched, and reconcile() checks
+them against the Loan table.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from apps.customers.models import Customer
+from apps.utils.cache import invalidate_customers
+from .models import CustomerCreditProfile, Loan
+from .scoring import amount_sum
+
+# Matured loans retired per transaction
+ROLL_OFF_BATCH_SIZE = 1000
+# Customers compared per query by reconcile()
+RECONCILE_BATCH_SIZE = 5000
+
+
+def is_matured(end_date, today=None):
+    """Whether a loan ending on end_date no longer counts as active"""
+    return end_date < (today or date.today())
+
+
+def active_principal():
+    """Per-customer active principal as a subquery against Customer rows"""
+    total = Loan.objects.filter(customer_id=OuterRef('pk'), rolled_off=False).order_by().values(
+        'customer_id'
+    ).annotate(total=amount_sum('loan_amount')).values('total')
+    return Coalesce(
+        Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2)
+    )
+
+
+def refresh_debt(customer_ids):
+    """Recompute current_debt of the given customers from the Loan table in one statement"""
+    return Customer.objects.filter(customer_id__in=customer_ids).update(
+        current_debt=F('opening_debt') + active_principal()
+    )
+
+
+def active_emis(customer_ids):
+    """
+    Per-customer sum of the monthly payments of loans not yet rolled off,
+    in one query; customers without such loans are omitted
+    """
+    rows = Loan.objects.filter(customer_id__in=customer_ids, rolled_off=False).order_by().values(
+        'customer_id'
+    ).annotate(total=amount_sum('monthly_payment'))
+    return {row['customer_id']: row['total'] for row in rows}
+
+
+def _per_customer(amounts):
+    # A fresh expression per query; the same instance cannot be resolved twice
+    return Case(
+        *[When(pk=customer_id, then=Value(amount)) for customer_id, amount in amounts.items()],
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def roll_off_matured(today=None, batch_size=ROLL_OFF_BATCH_SIZE):
+    """
+    Roll off running loans whose end date has passed.
+
+    Each batch locks its loans (skipping ones another worker holds), flags
+    them and subtracts their principal from the owners' current debt and
+    active principal in the same transaction, so a concurrent create_loan
+    adding to the same rows never loses an update. Returns the number of
+    loans and customers touched.
+    """
+    today = today or date.today()
+    loans = customers = 0
+    while True:
+        with transaction.atomic():
+            matured = list(
+                Loan.objects.select_for_update(skip_locked=True)
+                .filter(rolled_off=False, end_date__lt=today)
+                .order_by()
+                .values_list('loan_id', 'customer_id', 'loan_amount')[:batch_size]
+            )
+            if not matured:
+                break
+            amounts = defaultdict(Decimal)
+            for _, customer_id, amount in matured:
+                amounts[customer_id] += amount
+
+            Loan.objects.filter(pk__in=[loan_id for loan_id, _, _ in matured]).update(rolled_off=True)
+            Customer.objects.filter(pk__in=amounts).update(
+                current_debt=F('current_debt') - _per_customer(amounts)
+            )
+            CustomerCreditProfile.objects.filter(pk__in=amounts).update(
+                active_loan_amount=F('active_loan_amount') - _per_customer(amounts)
+            )
+            transaction.on_commit(lambda ids=list(amounts): invalidate_customers(ids))
+        loans += len(matured)
+        customers += len(amounts)
+    return {'loans_rolled_off': loans, 'customers_updated': customers}
+
+
+def reconcile(batch_size=RECONCILE_BATCH_SIZE, fix=False):
+    """
+    Compare every customer's current_debt and active principal with the
+    Loan table, streaming customers in customer_id order one batch per
+    query.
+
+    Yields (customer_id, field, stored, expected) for each mismatch. With
+    fix the mismatching customers of a batch are recomputed before the
+    next batch is read. Customers without a credit profile yet are only
+    checked for current_debt. Loans past their end date that are still
+    waiting for roll-off count as active, as they do everywhere else.
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            Customer.objects.filter(customer_id__gt=last_id)
+            .order_by('customer_id')
+            .values('customer_id', 'opening_debt', 'current_debt', 'credit_profile__active_loan_amount')
+            .annotate(active=amount_sum('loan__loan_amount', filter=Q(loan__rolled_off=False)))
+            [:batch_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1]['customer_id']
+
+        wrong_debt, wrong_profile = [], []
+        for row in rows:
+            expected = row['opening_debt'] + row['active']
+            if row['current_debt'] != expected:
+                wrong_debt.append(row['customer_id'])
+                yield row['customer_id'], 'current_debt', row['current_debt'], expected
+            profile_active = row['credit_profile__active_loan_amount']
+            if profile_active is not None and profile_active != row['active']:
+                wrong_profile.append(row['customer_id'])
+                yield row['customer_id'], 'active_loan_amount', profile_active, row['active']
+
+        if fix and (wrong_debt or wrong_profile):
+            with transaction.atomic():
+                refresh_debt(wrong_debt)
+                CustomerCreditProfile.objects.filter(customer_id__in=wrong_profile).update(
+                    active_loan_amount=active_principal()
+                )
+                transaction.on_commit(lambda ids=wrong_debt + wrong_profile: invalidate_customers(ids))
@@ -0,0 +1,64 @@
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from .models import IdSequence, Loan
+
+LOAN_SEQUENCE = 'loan_id'
+
+_lock = threading.Lock()
+_block = {'next': 0, 'end': 0}
+
+
+def reserve_loan_ids(count):
+    """
+    Reserve `count` consecutive loan ids and return the first one.
+
+    The sequence row is locked only for this short transaction, so call it
+    before opening the transaction that inserts the loans.
+    """
+    with transaction.atomic():
+        sequence = IdSequence.objects.select_for_update().filter(name=LOAN_SEQUENCE).first()
+        if sequence is None:
+            # Sequence missing (fresh or flushed database): start above every existing loan
+            sequence, _ = IdSequence.objects.get_or_create(
+                name=LOAN_SEQUENCE,
+                defaults={'next_value': (Loan.objects.aggregate(max_id=Max('loan_id'))['max_id'] or 0) + 1},
+            )
+            sequence = IdSequence.objects.select_for_update().get(name=LOAN_SEQUENCE)
+        first = sequence.next_value
+        sequence.next_value = first + count
+        sequence.save(update_fields=['next_value'])
+    return first
+
+
+def next_loan_id():
+    """
+    Hand out one loan id from this process's reserved block.
+
+    Blocks of LOAN_ID_BLOCK_SIZE ids are reserved at a time, so concurrent
+    workers only meet on the sequence row once per block.
+    """
+    with _lock:
+        if _block['next'] >= _block['end']:
+            size = settings.LOAN_ID_BLOCK_SIZE
+            _block['next'] = reserve_loan_ids(size)
+            _block['end'] = _block['next'] + size
+        loan_id = _block['next']
+        _block['next'] += 1
+    return loan_id
+
+
+def discard_block():
+    """Drop the cached block, e.g. after an id in it collided with ingested data"""
+    with _lock:
+        _block['next'] = _block['end'] = 0
+
+
+def advance_past(loan_id):
+    """Make sure ids are never handed out at or below an explicitly inserted loan_id"""
+    updated = IdSequence.objects.filter(
+        name=LOAN_SEQUENCE, next_value__lte=loan_id
+    ).update(next_value=loan_id + 1)
+    if not updated:
+        IdSequence.objects.get_or_create(name=LOAN_SEQUENCE, defaults={'next_value': loan_id + 1})
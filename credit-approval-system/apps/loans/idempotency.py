@@ -0,0 +1,82 @@
+"""
+Idempotency-Key support for create_loan and the batch endpoint.
+
+A client that retries with the same key gets the stored response of the
+first attempt instead of a second loan. The outcome is stored in the
+transaction that books the loan, so a loan never exists without its key
+or the other way round. Keys are honoured for IDEMPOTENCY_KEY_TTL
+seconds; purge_expired deletes the rows left behind.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from apps.utils.renderers import dumps
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def request_fingerprint(data):
+    """Hash of a validated request or batch; 12.5 and 12.50 are the same request"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def expiry_cutoff(now=None):
+    """Keys stored before this have outlived IDEMPOTENCY_KEY_TTL"""
+    return (now or timezone.now()) - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def replay(key, fingerprint):
+    """
+    The stored response for key, a 422 if key was used for a different
+    request, or None if key has not been used yet or has expired
+    """
+    stored = IdempotencyKey.objects.filter(key=key).first()
+    if stored is None:
+        return None
+    if stored.created_at < expiry_cutoff():
+        # Not purged yet; free the key so this request can store its own outcome
+        IdempotencyKey.objects.filter(key=key, created_at__lt=expiry_cutoff()).delete()
+        return None
+    if stored.fingerprint != fingerprint:
+        return HttpResponse(
+            dumps({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}),
+            status=422, content_type='application/json',
+        )
+    response = HttpResponse(stored.body, status=stored.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def save(key, fingerprint, data, status=200):
+    """
+    Store the response for key in the current transaction.
+
+    Raises IntegrityError when a concurrent request stored it first; on
+    PostgreSQL the insert waits for that request's transaction to end.
+    """
+    IdempotencyKey.objects.create(
+        key=key, fingerprint=fingerprint, status_code=status, body=dumps(data).decode()
+    )
+
+
+def save_or_replay(key, fingerprint, data, status=200):
+    """save() outside a loan transaction; the stored response if another request won"""
+    try:
+        with transaction.atomic():
+            save(key, fingerprint, data, status)
+    except IntegrityError:
+        return replay(key, fingerprint)
+    return None
+
+
+def purge_expired(now=None):
+    """Delete keys older than IDEMPOTENCY_KEY_TTL; returns how many"""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff(now)).delete()
+    return deleted
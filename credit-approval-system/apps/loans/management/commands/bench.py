@@ -0,0 +1,564 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from apps.utils.amortization import (
+    cached_annuity_factor, compute_annuity_factor, monthly_installment, monthly_installments, to_cents,
+)
+from apps.utils.cache import get_cache
+from apps.utils.data_ingestion import load_customers, load_loans
+
+DEFAULT_SCENARIOS = ('check_eligibility', 'create_loan', 'view_loan', 'view_loans')
+
+
+class Portfolio:
+    """Id ranges of the synthetic data the request generators draw from"""
+
+    def __init__(self, customers, loans):
+        self.customers = customers
+        self.loans = loans
+
+    def customer_id(self, rng):
+        return rng.randint(1, self.customers)
+
+    def loan_id(self, rng):
+        return rng.randint(1, self.loans)
+
+    def quote(self, rng):
+        return {
+            'customer_id': self.customer_id(rng),
+            'loan_amount': rng.choice([50000, 100000, 200000, 500000]),
+            'interest_rate': rng.choice([8.5, 10, 12, 14.5, 16]),
+            'tenure': rng.choice([6, 12, 24, 36, 60]),
+        }
+
+
+# Each scenario turns a Portfolio and a Random into (method, path, payload)
+SCENARIOS = {
+    'check_eligibility': lambda p, rng: ('post', '/api/check-eligibility/', p.quote(rng)),
+    'create_loan': lambda p, rng: ('post', '/api/create-loan/', p.quote(rng)),
+    'view_loan': lambda p, rng: ('get', f'/api/view-loan/{p.loan_id(rng)}/', None),
+    'view_loans': lambda p, rng: ('get', f'/api/view-loans/{p.customer_id(rng)}/', None),
+    'check_eligibility_async': lambda p, rng: ('post', '/api/async/check-eligibility/', p.quote(rng)),
+    'view_loan_async': lambda p, rng: ('get', f'/api/async/view-loan/{p.loan_id(rng)}/', None),
+    'view_loans_async': lambda p, rng: ('get', f'/api/async/view-loans/{p.customer_id(rng)}/', None),
+}
+
+# Served through the ASGI application on one event loop instead of test clients in threads
+ASYNC_SCENARIOS = {'check_eligibility_async', 'view_loan_async', 'view_loans_async'}
+# Scenarios that write; SQLite locks the whole database per writer, so
+# these only run at concurrency 1 there
+WRITE_SCENARIOS = {'create_loan'}
+
+
+def reset_caches():
+    """
+    Empty the shared cache and this process's in-memory caches.
+
+    Version counters go with the shared cache and restart from the clock,
+    so they also move past every value an entry was stored under.
+    """
+    from apps.loans.views import DECISIONS
+
+    get_cache().clear()
+    DECISIONS.clear()
+    cached_annuity_factor.cache_clear()
+
+
+@contextmanager
+def quiet_request_log():
+    """Keep django.request from logging failed requests, which are counted as errors instead"""
+    logger = logging.getLogger('django.request')
+    level = logger.level
+    logger.setLevel(logging.CRITICAL + 1)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def time_calls(name, calls, repeat=3):
+    """Best of `repeat` passes over a list of zero-argument calls, as a throughput result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for call in calls:
+            call()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'scenario': name,
+        'concurrency': 1,
+        'rows': len(calls),
+        'seconds': round(best, 4),
+        'throughput_rps': round(len(calls) / best, 2) if best else 0.0,
+    }
+
+
+def micro_emi(options):
+    """
+    Scalar EMIs for quotes drawn like the HTTP scenarios: the Decimal power
+    on every call against the annuity factor table, plus a parity count.
+    """
+    rng = random.Random(options['seed'])
+    quotes = [Portfolio(1, 1).quote(rng) for _ in range(options['requests'] * 100)]
+    terms = [(Decimal(str(q['loan_amount'])), Decimal(str(q['interest_rate'])), q['tenure']) for q in quotes]
+
+    def uncached(amount, rate, tenure):
+        factor = compute_annuity_factor(rate, tenure)
+        return to_cents(amount / tenure) if factor is None else to_cents(amount * factor)
+
+    cached_annuity_factor.cache_clear()
+    results = [
+        time_calls('emi_decimal_power', [lambda t=t: uncached(*t) for t in terms]),
+        time_calls('emi_annuity_table', [lambda t=t: monthly_installment(*t) for t in terms]),
+    ]
+    mismatches = sum(uncached(*t) != monthly_installment(*t) for t in terms)
+    results[-1]['mismatches'] = mismatches
+    return results
+
+
+def micro_render(options):
+    """
+    Serialization cost of the hot endpoints' bodies: DRF's JSONRenderer
+    against apps.utils.renderers.dumps, plus a count of differing bodies.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from apps.customers.models import Customer
+    from apps.loans.models import Loan
+    from apps.loans.views import eligibility_payload, loan_detail_payload, loan_page_payload
+    from apps.utils import renderers
+
+    rng = random.Random(options['seed'])
+    customer = Customer(customer_id=1, first_name='Bench', last_name='Customer', phone_number='9000000001',
+                        age=35, monthly_salary=Decimal('80000'), approved_limit=Decimal('2900000'))
+    bodies = {'check_eligibility': [], 'view_loan': [], 'view_loans': []}
+    for loan_id in range(1, options['requests'] + 1):
+        quote = Portfolio(1, 1).quote(rng)
+        terms = {key: Decimal(str(quote[key])) for key in ('loan_amount', 'interest_rate')}
+        terms['tenure'] = quote['tenure']
+        bodies['check_eligibility'].append(eligibility_payload(customer, rng.randint(0, 100), terms))
+        payment = monthly_installment(terms['loan_amount'], terms['interest_rate'], terms['tenure'])
+        loan = Loan(loan_id=loan_id, customer=customer, loan_amount=terms['loan_amount'],
+                    interest_rate=terms['interest_rate'], monthly_payment=payment, tenure=terms['tenure'])
+        bodies['view_loan'].append(loan_detail_payload(loan)[1])
+        rows = [{'loan_id': loan_id * 100 + i, 'loan_amount': loan.loan_amount, 'interest_rate': loan.interest_rate,
+                 'monthly_payment': payment, 'tenure': loan.tenure, 'emis_paid_on_time': i % loan.tenure}
+                for i in range(100)]
+        bodies['view_loans'].append(loan_page_payload(rows, 100)['loans'])
+
+    drf = JSONRenderer()
+    fast = 'render_orjson' if renderers.orjson is not None else 'render_stdlib'
+    results = []
+    for name, payloads in bodies.items():
+        results.append(time_calls(f'{name}_render_drf', [lambda p=p: drf.render(p) for p in payloads]))
+        results.append(time_calls(f'{name}_{fast}', [lambda p=p: renderers.dumps(p) for p in payloads]))
+        results[-1]['mismatches'] = sum(drf.render(p) != renderers.dumps(p) for p in payloads)
+    return results
+
+
+# Micro-benchmarks run in-process without a database; each returns results
+MICRO_BENCHMARKS = {
+    'emi': micro_emi,
+    'render': micro_render,
+}
+
+
+class QueryMonitor:
+    """
+    Counts queries on every connection opened during a run and optionally
+    delays each one, to simulate a slow or distant database
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        # At the front: execute_wrapper() blocks that are open while the
+        # connection is created pop the last wrapper when they exit
+        connection.execute_wrappers.insert(0, self)
+
+    def take(self):
+        with self.lock:
+            count, self.count = self.count, 0
+        return count
+
+
+async def asgi_request(application, method, path, payload):
+    """Send one request straight into an ASGI application; returns the status code"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method.upper(),
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    sent = {'body': False}
+    done = asyncio.Event()
+    result = {}
+
+    async def receive():
+        if not sent['body']:
+            sent['body'] = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await application(scope, receive, send)
+    return result.get('status', 500)
+
+
+def summarize(latencies, elapsed, errors, queries):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(float(latencies_ms.mean()), 3),
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 3),
+            'p99': round(float(np.percentile(latencies_ms, 99)), 3),
+        },
+        'queries_per_request': round(queries / len(latencies), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints and ingestion against a synthetic portfolio in a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help='Synthetic customers to seed')
+        parser.add_argument('--loans-per-customer', type=int, default=5, help='Average loans per customer')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and concurrency level')
+        parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+        parser.add_argument('--scenarios', default=','.join(DEFAULT_SCENARIOS),
+                            help=f'Comma-separated scenarios out of: {", ".join(SCENARIOS)}')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for data and requests')
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help='Milliseconds added to every query, to simulate a slow database')
+        parser.add_argument('--keep-cache', action='store_true',
+                            help='Let each concurrency level reuse the caches warmed by the previous one')
+        parser.add_argument('--sync-threads', type=int,
+                            help='Threads serving sync scenarios, like a WSGI worker (defaults to the concurrency)')
+        parser.add_argument('--micro',
+                            help=f'Run these micro-benchmarks instead of the HTTP scenarios: {", ".join(MICRO_BENCHMARKS)}')
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file from an earlier run')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p95/throughput change counted as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit non-zero on regressions')
+
+    def handle(self, *args, **options):
+        if options['micro']:
+            report = self.run_micro(options)
+        else:
+            report = self.run_scenarios(options)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if options['compare']:
+            regressions = self.compare(report, options['compare'], options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} regression(s) against {options["compare"]}')
+
+        # Timings of failing requests measure the failure, not the endpoint
+        failed = [
+            f'{result["scenario"]} c={result["concurrency"]} ({result["errors"]}/{result["requests"]})'
+            for result in report['results'] if result.get('errors')
+        ]
+        if failed:
+            raise CommandError(f'Requests failed in: {", ".join(failed)}')
+
+    def run_micro(self, options):
+        names = [name for name in options['micro'].split(',') if name]
+        unknown = set(names) - set(MICRO_BENCHMARKS)
+        if unknown:
+            raise CommandError(f'Unknown micro-benchmarks: {", ".join(sorted(unknown))}')
+
+        report = {
+            'meta': {'timestamp': datetime.now(timezone.utc).isoformat(), 'micro': names},
+            'results': [],
+        }
+        for name in names:
+            for result in MICRO_BENCHMARKS[name](options):
+                report['results'].append(result)
+                self.print_result(result)
+        return report
+
+    def run_scenarios(self, options):
+        scenarios = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        levels = [int(level) for level in options['concurrency'].split(',') if level]
+
+        self.monitor = QueryMonitor(options['db_latency'] / 1000)
+
+        # Everything runs in a test database so real data is never touched.
+        # Only the primary gets one, so replica_reads must not send reads
+        # to the configured replicas, which hold other data or none.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with quiet_request_log(), override_settings(DATABASE_REPLICAS=[]):
+                report = self.run(scenarios, levels, options)
+        finally:
+            connection_created.disconnect(self.monitor.install)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        return report
+
+    def run(self, scenarios, levels, options):
+        random.seed(options['seed'])
+        get_cache().clear()
+        serialized_writes = connection.vendor == 'sqlite' and any(name in WRITE_SCENARIOS for name in scenarios)
+
+        portfolio, ingestion = self.seed(options['customers'], options['loans_per_customer'], options['seed'])
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'customers': portfolio.customers,
+                'loans': portfolio.loans,
+                'requests': options['requests'],
+                'db_latency_ms': options['db_latency'],
+                'sync_threads': options['sync_threads'],
+                # Whether every level starts from cold caches or inherits the previous level's
+                'cache_between_levels': 'kept' if options['keep_cache'] else 'cleared',
+                # Write scenarios measured at concurrency 1 only
+                'serialized_writes': serialized_writes,
+            },
+            'results': [ingestion],
+        }
+        self.print_result(ingestion)
+        self.stdout.write(f"Caches {report['meta']['cache_between_levels']} between concurrency levels")
+        if serialized_writes:
+            self.stdout.write(self.style.WARNING(
+                'SQLite allows one writer at a time; write scenarios run at concurrency 1 only'
+            ))
+
+        # Installed after seeding so only request queries are counted and delayed
+        connection_created.connect(self.monitor.install)
+
+        for name in scenarios:
+            # Concurrent writers would mostly measure "database table is locked" errors
+            scenario_levels = [1] if serialized_writes and name in WRITE_SCENARIOS else levels
+            for level in scenario_levels:
+                # Every level replays the same seeded requests; without a reset
+                # the later ones would mostly measure the earlier ones' cache hits
+                if not options['keep_cache']:
+                    reset_caches()
+                result = {'scenario': name, 'concurrency': level}
+                if name in ASYNC_SCENARIOS:
+                    measured = asyncio.run(
+                        self.drive_async(SCENARIOS[name], portfolio, options['requests'], level, options['seed'])
+                    )
+                else:
+                    threads = min(level, options['sync_threads'] or level)
+                    measured = self.drive(SCENARIOS[name], portfolio, options['requests'], threads, options['seed'])
+                result.update(measured)
+                report['results'].append(result)
+                self.print_result(result)
+        return report
+
+    def seed(self, customers, loans_per_customer, seed):
+        """Load a synthetic portfolio through the bulk ingestion engine and time it"""
+        rng = np.random.default_rng(seed)
+        salaries = rng.choice([30000, 45000, 60000, 80000, 120000, 200000], customers)
+        customer_df = pd.DataFrame({
+            'customer_id': np.arange(1, customers + 1),
+            'first_name': 'Bench',
+            'last_name': [f'Customer{i}' for i in range(1, customers + 1)],
+            'age': rng.integers(21, 65, customers),
+            'phone_number': [f'9{i:09d}' for i in range(1, customers + 1)],
+            'monthly_salary': salaries,
+            'approved_limit': salaries * 36,
+            'current_debt': rng.integers(0, 100000, customers),
+        })
+
+        loan_count = customers * loans_per_customer
+        amounts = rng.choice([25000, 50000, 100000, 250000, 500000], loan_count)
+        rates = rng.choice([8.5, 10.0, 12.0, 14.5, 16.0], loan_count)
+        tenures = rng.choice([6, 12, 24, 36, 60], loan_count)
+        start_dates = [date.today() - timedelta(days=int(days)) for days in rng.integers(0, 1500, loan_count)]
+        loan_df = pd.DataFrame({
+            'customer_id': rng.integers(1, customers + 1, loan_count),
+            'loan_id': np.arange(1, loan_count + 1),
+            'loan_amount': amounts,
+            'tenure': tenures,
+            'interest_rate': rates,
+            'monthly_repayment': np.round(monthly_installments(amounts, rates, tenures), 2),
+            'emis_paid_on_time': [int(rng.integers(0, tenure + 1)) for tenure in tenures],
+            'start_date': start_dates,
+            'end_date': [start + timedelta(days=30 * int(tenure)) for start, tenure in zip(start_dates, tenures)],
+        })
+
+        chunk = 5000
+        started = time.perf_counter()
+        load_customers(customer_df.iloc[i:i + chunk] for i in range(0, len(customer_df), chunk))
+        load_loans(loan_df.iloc[i:i + chunk] for i in range(0, len(loan_df), chunk))
+        elapsed = time.perf_counter() - started
+
+        rows = len(customer_df) + len(loan_df)
+        ingestion = {
+            'scenario': 'ingestion',
+            'concurrency': 1,
+            'rows': rows,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(rows / elapsed, 2) if elapsed else 0.0,
+        }
+        return Portfolio(customers, loan_count), ingestion
+
+    def drive(self, scenario, portfolio, requests, concurrency, seed):
+        """Send `requests` requests from `concurrency` threads and measure each one"""
+        latencies = []
+        totals = {'errors': 0}
+        lock = threading.Lock()
+        per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        self.monitor.take()
+
+        def worker(index, count):
+            rng = random.Random(seed * 1000 + index)
+            client = Client(raise_request_exception=False)
+            local_latencies, errors = [], 0
+            for _ in range(count):
+                method, path, payload = scenario(portfolio, rng)
+                started = time.perf_counter()
+                try:
+                    if method == 'post':
+                        response = client.post(path, payload, content_type='application/json')
+                    else:
+                        response = client.get(path)
+                    failed = response.status_code >= 500
+                except Exception:
+                    # Raised outside the view, e.g. while closing a locked connection
+                    failed = True
+                local_latencies.append(time.perf_counter() - started)
+                errors += failed
+            connection.close()
+
+            with lock:
+                latencies.extend(local_latencies)
+                totals['errors'] += errors
+
+        threads = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_worker) if count]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return summarize(latencies, elapsed, totals['errors'], self.monitor.take())
+
+    async def drive_async(self, scenario, portfolio, requests, concurrency, seed):
+        """Send `requests` requests through the ASGI app, at most `concurrency` in flight"""
+        from credit_system.asgi import application
+
+        rng = random.Random(seed)
+        calls = [scenario(portfolio, rng) for _ in range(requests)]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+        self.monitor.take()
+
+        async def one(method, path, payload):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                status_code = await asgi_request(application, method, path, payload)
+                latencies.append(time.perf_counter() - started)
+                if status_code >= 500:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(*call) for call in calls))
+        elapsed = time.perf_counter() - started
+        return summarize(latencies, elapsed, errors, self.monitor.take())
+
+    def print_result(self, result):
+        label = f'{result["scenario"]:<20} c={result["concurrency"]:<3}'
+        if 'latency_ms' not in result:
+            mismatches = f'  {result["mismatches"]} mismatches' if 'mismatches' in result else ''
+            per_row = result['seconds'] / result['rows'] * 1_000_000 if result['rows'] else 0.0
+            self.stdout.write(
+                f'{label} {result["throughput_rps"]:>10.1f} rows/s  {per_row:>8.2f}us/row  '
+                f'({result["rows"]} rows in {result["seconds"]}s){mismatches}'
+            )
+            return
+        latency = result['latency_ms']
+        self.stdout.write(
+            f'{label} {result["throughput_rps"]:>10.1f} req/s  '
+            f'p50 {latency["p50"]:>8.2f}ms  p95 {latency["p95"]:>8.2f}ms  p99 {latency["p99"]:>8.2f}ms  '
+            f'{result["queries_per_request"]:>5.1f} q/req  {result["errors"]} errors'
+        )
+
+    def compare(self, report, baseline_path, threshold):
+        """Print regressions against a baseline report and return how many were found"""
+        with open(baseline_path) as handle:
+            baseline = {
+                (result['scenario'], result['concurrency']): result
+                for result in json.load(handle)['results']
+            }
+
+        regressions = 0
+        for result in report['results']:
+            before = baseline.get((result['scenario'], result['concurrency']))
+            if before is None:
+                continue
+            label = f'{result["scenario"]} c={result["concurrency"]}'
+            if result['throughput_rps'] < before['throughput_rps'] * (1 - threshold):
+                regressions += 1
+                self.stdout.write(self.style.ERROR(
+                    f'REGRESSION {label}: throughput {before["throughput_rps"]} -> {result["throughput_rps"]}'
+                ))
+            if 'latency_ms' in result and 'latency_ms' in before:
+                if result['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + threshold):
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'REGRESSION {label}: p95 {before["latency_ms"]["p95"]}ms -> {result["latency_ms"]["p95"]}ms'
+                    ))
+
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
+        return regressions
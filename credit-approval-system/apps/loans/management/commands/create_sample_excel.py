@@ -3,6 +3,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 import random
 import os
+from apps.utils.amortization import monthly_installment
 
 class Command(BaseCommand):
     help = 'Create sample Excel files for data ingestion demo'
@@ -50,11 +51,7 @@ class Command(BaseCommand):
                 interest_rate = random.choice([10.5, 12.0, 14.5, 16.0])
                 
                 # Calculate monthly repayment
-                monthly_rate = interest_rate / (12 * 100)
-                if monthly_rate == 0:
-                    monthly_payment = loan_amount / tenure
-                else:
-                    monthly_payment = (loan_amount * monthly_rate * (1 + monthly_rate)**tenure) / ((1 + monthly_rate)**tenure - 1)
+                monthly_payment = float(monthly_installment(loan_amount, interest_rate, tenure))
                 
                 loans.append({
                     'customer_id': customer_id,
@@ -62,7 +59,7 @@ class Command(BaseCommand):
                     'loan_amount': loan_amount,
                     'tenure': tenure,
                     'interest_rate': interest_rate,
-                    'monthly_repayment': round(monthly_payment, 2),
+                    'monthly_repayment': monthly_payment,
                     'emis_paid_on_time': random.randint(max(0, tenure - 6), tenure),
                     'start_date': start_date.strftime('%Y-%m-%d'),
                     'end_date': end_date.strftime('%Y-%m-%d')
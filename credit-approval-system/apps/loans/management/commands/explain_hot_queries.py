@@ -0,0 +1,71 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from apps.customers.models import Customer
+from apps.loans.exposure import ROLL_OFF_BATCH_SIZE, active_principal
+from apps.loans.models import Loan
+from apps.loans.scoring import loan_feature_aggregates, year_range
+
+
+class Command(BaseCommand):
+    help = 'Show the query plan of every hot Loan query (EXPLAIN ANALYZE on PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer-id', type=int, help='Customer to plan for (defaults to the one with most loans)')
+        parser.add_argument('--no-analyze', action='store_true', help='Plan only, do not execute the queries')
+
+    def handle(self, *args, **options):
+        customer_id = options['customer_id'] or self.busiest_customer()
+        if customer_id is None:
+            raise CommandError('No loans found; pass --customer-id or ingest data first')
+
+        today = date.today()
+        year_start, next_year_start = year_range(today.year)
+        loans = Loan.objects.filter(customer_id=customer_id)
+        sample_loan = loans.values_list('loan_id', flat=True).first() or 0
+
+        hot_queries = [
+            ('Credit profile rebuild: loan feature aggregate',
+             loans.values('customer_id').annotate(**loan_feature_aggregates(today=today)).order_by()),
+            ('Credit profile rebuild: loans per year',
+             loans.values('customer_id', year=ExtractYear('start_date')).annotate(count=Count('loan_id')).order_by()),
+            ('Scoring: current-year loan count',
+             loans.filter(start_date__gte=year_start, start_date__lt=next_year_start)
+             .values('customer_id').annotate(count=Count('loan_id')).order_by()),
+            ('Exposure: active principal (refresh_debt subquery)',
+             Customer.objects.filter(customer_id=customer_id).annotate(active=active_principal())
+             .values('customer_id', 'active')),
+            # roll_off_matured also locks the rows it reads; the plan is the same
+            ('Roll-off: running loans past their end date',
+             Loan.objects.filter(rolled_off=False, end_date__lt=today).order_by()
+             .values_list('loan_id', 'customer_id', 'loan_amount')[:ROLL_OFF_BATCH_SIZE]),
+            ('view_loans: customer loan list',
+             loans.order_by('loan_id').values(
+                 'loan_id', 'loan_amount', 'interest_rate', 'monthly_payment', 'tenure', 'emis_paid_on_time'
+             )),
+            ('view_loan: loan with customer',
+             Loan.objects.select_related('customer').filter(loan_id=sample_loan)),
+        ]
+
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': not options['no_analyze'], 'buffers': not options['no_analyze']}
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Query plans for customer {customer_id} on {connection.vendor}'
+        ))
+        for title, queryset in hot_queries:
+            self.stdout.write(self.style.WARNING(f'\n{title}'))
+            self.stdout.write('-' * 80)
+            self.stdout.write(queryset.explain(**explain_options))
+
+    def busiest_customer(self):
+        row = (
+            Loan.objects.values('customer_id')
+            .annotate(count=Count('loan_id'))
+            .order_by('-count')
+            .first()
+        )
+        return row['customer_id'] if row else None
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.loans.exposure import RECONCILE_BATCH_SIZE, reconcile, roll_off_matured
+
+
+class Command(BaseCommand):
+    help = "Check every customer's current debt and active principal against the Loan table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE, help='Customers per batch')
+        parser.add_argument('--fix', action='store_true', help='Recompute the mismatching customers')
+        parser.add_argument('--roll-off', action='store_true',
+                            help='Roll off loans past their end date before checking')
+
+    def handle(self, *args, **options):
+        if options['roll_off']:
+            result = roll_off_matured()
+            self.stdout.write(
+                f"Rolled off {result['loans_rolled_off']} loans of {result['customers_updated']} customers"
+            )
+
+        mismatches = 0
+        for customer_id, field, stored, expected in reconcile(options['batch_size'], fix=options['fix']):
+            mismatches += 1
+            if mismatches <= 20:
+                self.stdout.write(self.style.WARNING(
+                    f'Customer {customer_id}: {field} is {stored}, expected {expected}'
+                ))
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Current debt and active principal match the Loan table'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {mismatches} mismatch(es)'))
+        else:
+            raise CommandError(f'{mismatches} mismatch(es); rerun with --fix to correct them')
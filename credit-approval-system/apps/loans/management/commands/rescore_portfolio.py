@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.loans.rescoring import parity_mismatches, rescore_portfolio
+
+
+class Command(BaseCommand):
+    help = 'Rescore every customer with the vectorized scoring rules and report the score distribution'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Customers per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Compute the distribution without writing scores')
+        parser.add_argument('--check-parity', action='store_true',
+                            help='Compare every vectorized score with the request-path score instead')
+
+    def handle(self, *args, **options):
+        if options['check_parity']:
+            mismatches = parity_mismatches(options['batch_size'])
+            for customer_id, vectorized, expected in mismatches[:20]:
+                self.stdout.write(self.style.WARNING(
+                    f'Customer {customer_id}: vectorized {vectorized}, request path {expected}'
+                ))
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} score mismatch(es)')
+            self.stdout.write(self.style.SUCCESS('Vectorized scores match the request path for every customer'))
+            return
+
+        distribution = rescore_portfolio(options['batch_size'], dry_run=options['dry_run'])
+        action = 'Scored' if options['dry_run'] else 'Rescored'
+        if not distribution['customers']:
+            self.stdout.write(self.style.WARNING('No customers to score'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {distribution['customers']} customers: mean {distribution['mean']}, "
+            f"p10 {distribution['p10']}, p50 {distribution['p50']}, p90 {distribution['p90']}"
+        ))
+        for band, count in distribution['bands'].items():
+            share = count / distribution['customers'] * 100
+            self.stdout.write(f'  {band:>7}  {count:>9}  {share:5.1f}%')
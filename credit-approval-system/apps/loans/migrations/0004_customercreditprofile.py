@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('loans', '0003_alter_loan_customer_delete_customer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditProfile',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_profile', serialize=False, to='customers.customer')),
+                ('loan_count', models.IntegerField(default=0)),
+                ('total_emis', models.IntegerField(default=0)),
+                ('emis_paid_on_time', models.IntegerField(default=0)),
+                ('loans_per_year', models.JSONField(default=dict)),
+                ('total_loan_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('active_loan_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('active_as_of', models.DateField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
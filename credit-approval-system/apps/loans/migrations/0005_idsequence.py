@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:54
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_loan_sequence(apps, schema_editor):
+    IdSequence = apps.get_model('loans', 'IdSequence')
+    Loan = apps.get_model('loans', 'Loan')
+    max_id = Loan.objects.aggregate(max_id=Max('loan_id'))['max_id'] or 0
+    IdSequence.objects.create(name='loan_id', next_value=max_id + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_customercreditprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(seed_loan_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('loans', '0005_idsequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loan',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='customers.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'loan_id'], include=('loan_amount', 'interest_rate', 'monthly_payment', 'tenure', 'emis_paid_on_time'), name='loan_customer_loan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'start_date'], name='loan_customer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'end_date'], include=('loan_amount',), name='loan_customer_end_idx'),
+        ),
+    ]
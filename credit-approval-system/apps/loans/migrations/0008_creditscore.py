@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customer_row_hash'),
+        ('loans', '0007_loan_row_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditScore',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='portfolio_score', serialize=False, to='customers.customer')),
+                ('score', models.IntegerField(db_index=True)),
+                ('as_of', models.DateField()),
+                ('scored_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
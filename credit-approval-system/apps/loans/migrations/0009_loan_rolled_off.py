@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:02
+
+from datetime import date
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def roll_off_ended_loans(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    CustomerCreditProfile = apps.get_model('loans', 'CustomerCreditProfile')
+    Loan = apps.get_model('loans', 'Loan')
+
+    Loan.objects.filter(end_date__lt=date.today()).update(rolled_off=True)
+
+    def active_principal():
+        total = Loan.objects.filter(customer_id=OuterRef('pk'), rolled_off=False).order_by().values(
+            'customer_id'
+        ).annotate(total=Sum('loan_amount')).values('total')
+        return Coalesce(
+            Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2)
+        )
+
+    CustomerCreditProfile.objects.update(active_loan_amount=active_principal())
+    Customer.objects.update(current_debt=F('opening_debt') + active_principal())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_opening_debt'),
+        ('loans', '0008_creditscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='rolled_off',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(
+                condition=models.Q(('rolled_off', False)), fields=['end_date'], name='loan_running_end_idx'
+            ),
+        ),
+        migrations.RemoveField(
+            model_name='customercreditprofile',
+            name='active_as_of',
+        ),
+        migrations.RunPython(roll_off_ended_loans, migrations.RunPython.noop),
+    ]
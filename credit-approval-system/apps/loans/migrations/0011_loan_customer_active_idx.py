@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='loan',
+            name='loan_customer_end_idx',
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('rolled_off', False)), fields=['customer'], include=('loan_amount',), name='loan_customer_active_idx'),
+        ),
+    ]
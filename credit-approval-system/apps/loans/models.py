@@ -1,9 +1,11 @@
+from decimal import Decimal
 from django.db import models
 from apps.customers.models import Customer
 
 class Loan(models.Model):
     loan_id = models.IntegerField(unique=True, primary_key=True)
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    # Indexed through the composite indexes below, which all lead with customer
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_index=False)
     loan_amount = models.DecimalField(max_digits=15, decimal_places=2)
     tenure = models.IntegerField()
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
@@ -11,6 +13,102 @@ class Loan(models.Model):
     emis_paid_on_time = models.IntegerField(default=0)
     start_date = models.DateField()
     end_date = models.DateField()
+    # Set once the loan has ended and its principal left the customer's debt
+    rolled_off = models.BooleanField(default=False)
+    # Content hash of the ingested source row; empty for loans created through the API
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # view_loans: a customer's loans in loan_id order, served from the index
+            models.Index(
+                fields=['customer', 'loan_id'],
+                include=['loan_amount', 'interest_rate', 'monthly_payment', 'tenure', 'emis_paid_on_time'],
+                name='loan_customer_loan_idx',
+            ),
+            # Scoring: loans of a customer started within a year
+            models.Index(fields=['customer', 'start_date'], name='loan_customer_start_idx'),
+            # Exposure: active principal of a customer, summed over its running loans
+            models.Index(
+                fields=['customer'], include=['loan_amount'], condition=models.Q(rolled_off=False),
+                name='loan_customer_active_idx',
+            ),
+            # Roll-off: running loans that have reached their end date
+            models.Index(fields=['end_date'], condition=models.Q(rolled_off=False), name='loan_running_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"Loan {self.loan_id} - {self.customer.first_name}" 
+
+class CustomerCreditProfile(models.Model):
+    """Pre-aggregated loan history used by the scoring rules"""
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_profile'
+    )
+    loan_count = models.IntegerField(default=0)
+    total_emis = models.IntegerField(default=0)
+    emis_paid_on_time = models.IntegerField(default=0)
+    loans_per_year = models.JSONField(default=dict)
+    total_loan_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    # Principal of the loans not yet rolled off
+    active_loan_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Credit profile - customer {self.customer_id}"
+
+    def features(self, today):
+        return {
+            'loan_count': self.loan_count,
+            'total_emis': self.total_emis,
+            'emis_paid_on_time': self.emis_paid_on_time,
+            'current_year_loans': self.loans_per_year.get(str(today.year), 0),
+            'total_loan_amount': self.total_loan_amount,
+            'active_loan_amount': self.active_loan_amount,
+        }
+
+    def add_loan(self, loan):
+        year = str(loan.start_date.year)
+        self.loan_count += 1
+        self.total_emis += loan.tenure
+        self.emis_paid_on_time += loan.emis_paid_on_time
+        self.loans_per_year[year] = self.loans_per_year.get(year, 0) + 1
+        self.total_loan_amount += Decimal(str(loan.loan_amount))
+        if not loan.rolled_off:
+            self.active_loan_amount += Decimal(str(loan.loan_amount))
+
+
+class CreditScore(models.Model):
+    """A customer's score from the latest portfolio rescoring run"""
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='portfolio_score'
+    )
+    score = models.IntegerField(db_index=True)
+    as_of = models.DateField()
+    scored_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Credit score {self.score} - customer {self.customer_id}"
+
+
+class IdSequence(models.Model):
+    """Next unreserved value for an application-assigned primary key"""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} -> {self.next_value}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a loan creation request sent with an Idempotency-Key header"""
+    key = models.CharField(max_length=255, primary_key=True)
+    # Hash of the validated request, so a key reused for another request is caught
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField()
+    # Rendered JSON body, replayed byte for byte
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
-        return f"Loan {self.loan_id} - {self.customer.first_name}" 
\ No newline at end of file
+        return f"Idempotency key {self.key} -> {self.status_code}"
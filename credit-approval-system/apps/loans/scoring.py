@@ -0,0 +1,326 @@
+from decimal import Decimal
+from datetime import date
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, ExtractYear
+from apps.customers.models import Customer
+from apps.utils.cache import aget_versions, aread_through, customer_version_key, get_versions, read_through
+from .models import CustomerCreditProfile, Loan
+
+LOAN_FEATURES = (
+    'loan_count',
+    'total_emis',
+    'emis_paid_on_time',
+    'current_year_loans',
+    'total_loan_amount',
+    'active_loan_amount',
+)
+
+PROFILE_FIELDS = (
+    'loan_count',
+    'total_emis',
+    'emis_paid_on_time',
+    'loans_per_year',
+    'total_loan_amount',
+    'active_loan_amount',
+)
+
+
+def year_range(year):
+    """Half-open [Jan 1, next Jan 1) bounds; unlike __year this can use a start_date index"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def amount_sum(field, filter=None):
+    """Sum of a money column that is 0, not NULL, when no rows match"""
+    return Coalesce(
+        Sum(field, filter=filter),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+
+
+def loan_feature_aggregates(prefix='', today=None):
+    """
+    Aggregate expressions for every loan feature the scoring rules need.
+
+    `prefix` lets the same expressions run against `Loan` directly ('')
+    or through the reverse relation from `Customer` ('loan__').
+    """
+    today = today or date.today()
+    year_start, next_year_start = year_range(today.year)
+    return {
+        'loan_count': Count(f'{prefix}loan_id'),
+        'total_emis': Coalesce(Sum(f'{prefix}tenure'), 0),
+        'emis_paid_on_time': Coalesce(Sum(f'{prefix}emis_paid_on_time'), 0),
+        'current_year_loans': Count(
+            f'{prefix}loan_id',
+            filter=Q(**{f'{prefix}start_date__gte': year_start, f'{prefix}start_date__lt': next_year_start}),
+        ),
+        'total_loan_amount': amount_sum(f'{prefix}loan_amount'),
+        'active_loan_amount': amount_sum(
+            f'{prefix}loan_amount', filter=Q(**{f'{prefix}rolled_off': False})
+        ),
+    }
+
+
+def compute_profiles(customer_ids, today=None):
+    """Recompute credit profile values for the given customers from the Loan table"""
+    today = today or date.today()
+    profiles = {
+        customer_id: {
+            'loan_count': 0,
+            'total_emis': 0,
+            'emis_paid_on_time': 0,
+            'loans_per_year': {},
+            'total_loan_amount': Decimal('0'),
+            'active_loan_amount': Decimal('0'),
+        }
+        for customer_id in set(customer_ids)
+    }
+    loans = Loan.objects.filter(customer_id__in=profiles.keys())
+
+    aggregates = loan_feature_aggregates(today=today)
+    del aggregates['current_year_loans']
+    for row in loans.values('customer_id').annotate(**aggregates).order_by():
+        profiles[row.pop('customer_id')].update(row)
+
+    per_year = loans.values('customer_id', year=ExtractYear('start_date')).annotate(
+        count=Count('loan_id')
+    ).order_by()
+    for row in per_year:
+        profiles[row['customer_id']]['loans_per_year'][str(row['year'])] = row['count']
+
+    return profiles
+
+
+def lock_customers(customer_ids):
+    """
+    Lock the given customers' rows, in id order so concurrent callers
+    cannot deadlock; the caller must be in a transaction.
+
+    create_loan and the batch endpoint hold the same lock while they book
+    a loan and fold it into the profile.
+    """
+    list(
+        Customer.objects.select_for_update().filter(customer_id__in=set(customer_ids))
+        .order_by('customer_id').values_list('customer_id', flat=True)
+    )
+
+
+def rebuild_profiles(customer_ids, today=None):
+    """
+    Recompute and upsert credit profiles; returns the saved profiles.
+
+    The customers are locked before their loans are aggregated, so a loan
+    booked concurrently is either in the aggregate or waits for the
+    upsert, never overwritten by it.
+    """
+    with transaction.atomic():
+        lock_customers(customer_ids)
+        return save_profiles(compute_profiles(customer_ids, today))
+
+
+def save_profiles(computed):
+    """Upsert profiles produced by compute_profiles in one statement"""
+    profiles = [
+        CustomerCreditProfile(customer_id=customer_id, **fields)
+        for customer_id, fields in computed.items()
+    ]
+    CustomerCreditProfile.objects.bulk_create(
+        profiles,
+        update_conflicts=True,
+        unique_fields=['customer'],
+        update_fields=list(PROFILE_FIELDS) + ['updated_at'],
+    )
+    return profiles
+
+
+def record_loan(loan):
+    """
+    Fold a newly inserted loan into its customer's credit profile and
+    current debt.
+
+    Must run inside the transaction that inserted the loan so neither
+    disagrees with the Loan table.
+    """
+    if not loan.rolled_off:
+        Customer.objects.filter(customer_id=loan.customer_id).update(
+            current_debt=F('current_debt') + loan.loan_amount
+        )
+    profile = CustomerCreditProfile.objects.select_for_update().filter(
+        customer_id=loan.customer_id
+    ).first()
+    if profile is None:
+        # The fresh aggregate already includes the loan just inserted
+        rebuild_profiles([loan.customer_id])
+        return
+    profile.add_loan(loan)
+    profile.save()
+
+
+def get_loan_features(customer_id, today=None):
+    """Fetch all scoring features for one customer from its credit profile"""
+    today = today or date.today()
+    profile = CustomerCreditProfile.objects.filter(customer_id=customer_id).first()
+    if profile is None:
+        profile, = rebuild_profiles([customer_id], today)
+    return profile.features(today)
+
+
+async def aget_loan_features(customer_id, today=None):
+    """
+    get_loan_features for async views.
+
+    An existing profile is read with one async query. Building a missing
+    one is a bulk upsert the async ORM cannot do, so that rare case runs
+    the sync path in a thread.
+    """
+    today = today or date.today()
+    profile = await CustomerCreditProfile.objects.filter(customer_id=customer_id).afirst()
+    if profile is None:
+        return await sync_to_async(get_loan_features)(customer_id, today)
+    return profile.features(today)
+
+
+def credit_score_from_features(customer, features):
+    """Apply the scoring rules to pre-aggregated loan features"""
+    if not features['loan_count']:
+        return 50  # Default score for new customers
+
+    # Component 1: Past loans paid on time (35% weight)
+    total_emis = features['total_emis']
+    paid_on_time = features['emis_paid_on_time']
+
+    if total_emis > 0:
+        on_time_percentage = (paid_on_time / total_emis) * 100
+        if on_time_percentage > 95:
+            component1 = 35
+        elif on_time_percentage > 90:
+            component1 = 25
+        else:
+            component1 = 15
+    else:
+        component1 = 20
+
+    # Component 2: Number of loans (20% weight)
+    loan_count = features['loan_count']
+    if loan_count <= 2:
+        component2 = 20
+    elif loan_count <= 5:
+        component2 = 15
+    else:
+        component2 = 10
+
+    # Component 3: Current year activity (20% weight)
+    if features['current_year_loans'] <= 2:
+        component3 = 20
+    else:
+        component3 = 10
+
+    # Component 4: Loan volume (15% weight)
+    if features['total_loan_amount'] <= customer.approved_limit * Decimal('0.5'):
+        component4 = 15
+    else:
+        component4 = 10
+
+    # Component 5: Current debt (10% weight)
+    if customer.current_debt <= customer.approved_limit * Decimal('0.3'):
+        component5 = 10
+    else:
+        component5 = 5
+
+    return min(component1 + component2 + component3 + component4 + component5, 100)
+
+
+def credit_scores_from_arrays(loan_count, total_emis, emis_paid_on_time, current_year_loans,
+                              total_loan_cents, approved_limit_cents, current_debt_cents):
+    """
+    credit_score_from_features for many customers at once.
+
+    Takes parallel NumPy arrays and returns an int array of scores. Money
+    is passed in integer cents so the Decimal thresholds of the rules
+    (half and 30% of the approved limit) compare exactly.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        on_time_percentage = (emis_paid_on_time / total_emis) * 100
+    component1 = np.where(
+        total_emis > 0,
+        np.where(on_time_percentage > 95, 35, np.where(on_time_percentage > 90, 25, 15)),
+        20,
+    )
+    component2 = np.where(loan_count <= 2, 20, np.where(loan_count <= 5, 15, 10))
+    component3 = np.where(current_year_loans <= 2, 20, 10)
+    component4 = np.where(total_loan_cents * 2 <= approved_limit_cents, 15, 10)
+    component5 = np.where(current_debt_cents * 10 <= approved_limit_cents * 3, 10, 5)
+
+    scores = np.minimum(component1 + component2 + component3 + component4 + component5, 100)
+    # Default score for new customers
+    return np.where(loan_count == 0, 50, scores)
+
+
+def calculate_credit_score(customer):
+    """Calculate credit score based on loan history"""
+    return credit_score_from_features(customer, get_loan_features(customer.customer_id))
+
+
+def cached_credit_score(customer):
+    """calculate_credit_score behind the cache, keyed by the customer's version and the day"""
+    version_key = customer_version_key(customer.customer_id)
+    version = get_versions([version_key])[version_key]
+    return read_through(
+        'credit_score',
+        f'credit_score:{customer.customer_id}:{version}:{date.today().isoformat()}',
+        lambda: calculate_credit_score(customer),
+    )
+
+
+async def acached_credit_score(customer):
+    """cached_credit_score for async views, sharing its cache entries"""
+    version_key = customer_version_key(customer.customer_id)
+    version = (await aget_versions([version_key]))[version_key]
+
+    async def build():
+        return credit_score_from_features(customer, await aget_loan_features(customer.customer_id))
+
+    return await aread_through(
+        'credit_score',
+        f'credit_score:{customer.customer_id}:{version}:{date.today().isoformat()}',
+        build,
+    )
+
+
+def customers_with_scores(customer_ids, lock=False):
+    """
+    Load and score many customers at once.
+
+    Customers and their credit profiles are read in one query; customers
+    without a profile yet get theirs built in one batch. Returns a dict of
+    customer_id -> Customer with a `credit_score` attribute and its
+    `credit_profile` loaded; unknown ids are omitted. With lock the
+    customer rows are locked, in id order so concurrent batches cannot
+    deadlock; the caller must be in a transaction.
+    """
+    today = date.today()
+    customers = Customer.objects.filter(customer_id__in=set(customer_ids)).select_related('credit_profile')
+    if lock:
+        customers = customers.select_for_update(of=('self',)).order_by('customer_id')
+    customers = list(customers)
+    missing = [customer.customer_id for customer in customers if not hasattr(customer, 'credit_profile')]
+    rebuilt = {profile.customer_id: profile for profile in rebuild_profiles(missing, today)} if missing else {}
+
+    for customer in customers:
+        profile = rebuilt.get(customer.customer_id) or customer.credit_profile
+        customer.credit_profile = profile
+        customer.credit_score = credit_score_from_features(customer, profile.features(today))
+    return {customer.customer_id: customer for customer in customers}
+
+
+def score_customers(customer_ids):
+    """Score many customers at once; returns a dict of customer_id -> score"""
+    return {
+        customer_id: customer.credit_score
+        for customer_id, customer in customers_with_scores(customer_ids).items()
+    }
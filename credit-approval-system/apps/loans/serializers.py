@@ -21,9 +21,10 @@ class CustomerRegistrationSerializer(serializers.ModelSerializer):
 
 class LoanEligibilitySerializer(serializers.Serializer):
     customer_id = serializers.IntegerField()
-    loan_amount = serializers.DecimalField(max_digits=15, decimal_places=2)
-    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
-    tenure = serializers.IntegerField()
+    loan_amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0)
+    interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    # Months; the annuity formula divides by zero for an empty tenure
+    tenure = serializers.IntegerField(min_value=1)
 
 class LoanSerializer(serializers.ModelSerializer):
     customer_id = serializers.IntegerField(write_only=True)
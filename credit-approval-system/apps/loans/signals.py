@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.customers.models import Customer
+from apps.utils.cache import invalidate_customers, invalidate_loans
+from .models import Loan
+
+# Versions are bumped once the write commits, so a concurrent reader cannot
+# re-cache the old row under the new version.
+
+
+@receiver([post_save, post_delete], sender=Loan)
+def invalidate_loan_cache(sender, instance, **kwargs):
+    loan_id, customer_id = instance.loan_id, instance.customer_id
+
+    def invalidate():
+        invalidate_loans([loan_id])
+        invalidate_customers([customer_id])
+
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_customer_cache(sender, instance, **kwargs):
+    customer_id = instance.customer_id
+    transaction.on_commit(lambda: invalidate_customers([customer_id]))
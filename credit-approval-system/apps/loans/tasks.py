@@ -1,60 +1,44 @@
-from celery import shared_task
-import pandas as pd
+from celery import chain, chord, shared_task
+from django.conf import settings
 from django.db import transaction
-from .models import Customer, Loan
-from datetime import datetime
-import os
+from apps.loans.exposure import refresh_debt, roll_off_matured
+from apps.loans.idempotency import purge_expired
+from apps.loans.rescoring import rescore_portfolio as run_rescoring
+from apps.loans.scoring import rebuild_profiles
+from apps.utils.cache import invalidate_customers
+from apps.utils.data_ingestion import load_customers, load_loans, reset_customer_sequence
+from apps.utils.metrics import StageTimer
+from apps.utils import progress
+from apps.utils.readers import CSV, XLSX, count_rows, detect_format, partition_rows, read_batches, write_csv
 import logging
+import os
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True)
-def ingest_customer_data(self, file_path):
+def ingest_customer_data(self, file_path, chunk_size=None, file_format=None):
     """
-    Background task to ingest customer data from Excel file
+    Background task to ingest customer data from an Excel, CSV or Parquet file
     """
     try:
         logger.info(f"Starting customer data ingestion from {file_path}")
         
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        customers_created = 0
-        customers_updated = 0
+        # Stream the file in batches; total is None when the format has no row count
+        total = count_rows(file_path, file_format)
         
-        with transaction.atomic():
-            for index, row in df.iterrows():
-                customer, created = Customer.objects.get_or_create(
-                    customer_id=row['customer_id'],
-                    defaults={
-                        'first_name': row['first_name'],
-                        'last_name': row['last_name'],
-                        'age': row['age'],
-                        'phone_number': row['phone_number'],
-                        'monthly_salary': row['monthly_salary'],
-                        'approved_limit': row['approved_limit'],
-                        'current_debt': row.get('current_debt', 0)
-                    }
-                )
-                
-                if created:
-                    customers_created += 1
-                else:
-                    customers_updated += 1
-                
-                # Update progress
-                if index % 100 == 0:
-                    self.update_state(
-                        state='PROGRESS',
-                        meta={'current': index, 'total': len(df)}
-                    )
-        
-        result = {
-            'status': 'SUCCESS',
-            'customers_created': customers_created,
-            'customers_updated': customers_updated,
-            'total_processed': len(df)
-        }
+        timer = StageTimer()
+        result = load_customers(
+            timer.iterate(read_batches(file_path, chunk_size, file_format)),
+            on_progress=lambda current, counts: self.update_state(
+                state='PROGRESS',
+                meta={'current': current, 'total': total}
+            )
+        )
+        result['rows_per_second'] = round(timer.publish('ingest_customer_data', result['total_processed']), 2)
+        result['stage_seconds'] = {stage: round(seconds, 3) for stage, seconds in timer.seconds.items()}
+        result['status'] = 'SUCCESS'
         
         logger.info(f"Customer data ingestion completed: {result}")
         return result
@@ -64,64 +48,225 @@ def ingest_customer_data(self, file_path):
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
 @shared_task(bind=True)
-def ingest_loan_data(self, file_path):
+def ingest_loan_data(self, file_path, chunk_size=None, file_format=None):
     """
-    Background task to ingest loan data from Excel file
+    Background task to ingest loan data from an Excel, CSV or Parquet file
     """
     try:
         logger.info(f"Starting loan data ingestion from {file_path}")
         
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        loans_created = 0
-        loans_updated = 0
+        # Stream the file in batches; total is None when the format has no row count
+        total = count_rows(file_path, file_format)
         
-        with transaction.atomic():
-            for index, row in df.iterrows():
-                try:
-                    customer = Customer.objects.get(customer_id=row['customer_id'])
-                    
-                    loan, created = Loan.objects.get_or_create(
-                        loan_id=row['loan_id'],
-                        defaults={
-                            'customer': customer,
-                            'loan_amount': row['loan_amount'],
-                            'tenure': row['tenure'],
-                            'interest_rate': row['interest_rate'],
-                            'monthly_payment': row['monthly_repayment'],
-                            'emis_paid_on_time': row['emis_paid_on_time'],
-                            'start_date': pd.to_datetime(row['start_date']).date(),
-                            'end_date': pd.to_datetime(row['end_date']).date()
-                        }
-                    )
-                    
-                    if created:
-                        loans_created += 1
-                    else:
-                        loans_updated += 1
-                        
-                except Customer.DoesNotExist:
-                    logger.warning(f"Customer {row['customer_id']} not found for loan {row['loan_id']}")
-                    continue
-                
-                # Update progress
-                if index % 100 == 0:
-                    self.update_state(
-                        state='PROGRESS',
-                        meta={'current': index, 'total': len(df)}
-                    )
-        
-        result = {
-            'status': 'SUCCESS',
-            'loans_created': loans_created,
-            'loans_updated': loans_updated,
-            'total_processed': len(df)
-        }
+        timer = StageTimer()
+        result = load_loans(
+            timer.iterate(read_batches(file_path, chunk_size, file_format)),
+            on_progress=lambda current, counts: self.update_state(
+                state='PROGRESS',
+                meta={'current': current, 'total': total}
+            ),
+            timer=timer
+        )
+        result['rows_per_second'] = round(timer.publish('ingest_loan_data', result['total_processed']), 2)
+        result['stage_seconds'] = {stage: round(seconds, 3) for stage, seconds in timer.seconds.items()}
+        result['status'] = 'SUCCESS'
         
         logger.info(f"Loan data ingestion completed: {result}")
         return result
         
     except Exception as e:
         logger.error(f"Error in loan data ingestion: {str(e)}")
-        raise self.retry(exc=e, countdown=60, max_retries=3) 
\ No newline at end of file
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+CUSTOMERS = 'customers'
+LOANS = 'loans'
+
+# Metric names the partitions report under, shared with the single-file tasks
+PARTITION_METRICS = {CUSTOMERS: 'ingest_customer_data', LOANS: 'ingest_loan_data'}
+
+
+def start_ingestion(customer_path, loan_path, customer_format=None, loan_format=None,
+                    chunk_size=None, partitions=None):
+    """
+    Start the partitioned customer -> loan ingestion workflow.
+
+    Loans only start once every customer partition has committed, so no loan
+    is skipped for a customer that is still being loaded. Returns the
+    AsyncResult whose value is the merged result of both files; its id is
+    also the job id progress events are published under.
+    """
+    job_id = str(uuid.uuid4())
+    workflow = chain(
+        ingest_partitioned.s({}, CUSTOMERS, customer_path, customer_format, chunk_size, partitions, job_id),
+        ingest_partitioned.s(LOANS, loan_path, loan_format, chunk_size, partitions, job_id, final=True)
+        .set(task_id=job_id),
+    )
+    return workflow.apply_async()
+
+
+@shared_task(bind=True)
+def ingest_partitioned(self, previous, kind, file_path, file_format=None, chunk_size=None, partitions=None,
+                       job_id=None, final=False):
+    """
+    Split one file into row ranges and replace this task with a chord that
+    loads them in parallel and merges their counts into `previous`.
+    The final step of a job publishes its 'complete' progress event.
+
+    Partitions of a CSV seek straight to their first row. An xlsx file
+    cannot be read from the middle, so one that needs several partitions
+    is copied to CSV once here rather than parsed from the top by each.
+    """
+    chunk_size = chunk_size or settings.INGESTION_CHUNK_SIZE
+    partitions = partitions or settings.INGESTION_PARTITIONS
+    file_format = file_format or detect_format(file_path)
+
+    # Never split below one chunk per partition
+    converted = None
+    try:
+        ranges = partition_rows(file_path, partitions, file_format, min_rows=chunk_size)
+        if file_format == XLSX and len(ranges) > 1:
+            converted = write_csv(file_path, f'{os.path.splitext(file_path)[0]}.{kind}.csv', file_format, chunk_size)
+            file_path, file_format = converted, CSV
+            ranges = partition_rows(file_path, partitions, file_format, min_rows=chunk_size)
+    except Exception as e:
+        progress.publish(job_id, 'error', {'stage': kind, 'error': str(e)})
+        raise
+    logger.info(f"Ingesting {kind} from {file_path} in {len(ranges)} partition(s): {ranges}")
+    progress.stage_started(job_id, kind, ranges[-1][1] if ranges else 0, len(ranges))
+
+    started = time.time()
+    merge = merge_partitions.s(kind, previous, started, job_id, final, converted)
+    if not ranges:
+        return merge([])
+
+    header = [
+        ingest_partition.s(kind, file_path, start, stop, chunk_size, file_format, job_id, offset)
+        for start, stop, offset in ranges
+    ]
+    return self.replace(chord(header, merge))
+
+
+@shared_task(bind=True)
+def ingest_partition(self, kind, file_path, start, stop, chunk_size=None, file_format=None, job_id=None,
+                     offset=None):
+    """
+    Load rows [start, stop) of an ingestion file, starting at byte `offset`
+    for CSV; safe to retry because rows that already exist are skipped
+    """
+    try:
+        # A retry starts its rows over, so drop what the failed attempt reported
+        progress.partition_started(job_id, kind, start)
+        timer = StageTimer()
+        chunks = timer.iterate(read_batches(file_path, chunk_size, file_format, start, stop, offset))
+
+        def on_progress(current, counts):
+            progress.report_progress(job_id, kind, partition=start, **counts)
+
+        if kind == CUSTOMERS:
+            result = load_customers(chunks, on_progress=on_progress)
+        else:
+            # A retry may find chunks its failed attempt already committed
+            result = load_loans(
+                chunks, on_progress=on_progress, timer=timer, defer_profiles=True,
+                include_unchanged=self.request.retries > 0
+            )
+        timer.publish(PARTITION_METRICS[kind], result['total_processed'])
+        result['partition'] = [start, stop]
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in {kind} partition {start}-{stop} of {file_path}: {str(e)}")
+        if self.request.retries >= 3:
+            progress.publish(job_id, 'error', {'stage': kind, 'partition': [start, stop], 'error': str(e)})
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+@shared_task
+def merge_partitions(results, kind, previous, started, job_id=None, final=False, converted=None):
+    """
+    Sum the counts of every partition of one file and finish the load:
+    reset the customer sequence once all customer ids are in, or rebuild
+    the credit profiles and current debt the loan partitions deferred.
+    `converted` is the CSV copy ingest_partitioned made, if any, and is
+    removed.
+    """
+    if converted and os.path.exists(converted):
+        os.remove(converted)
+    merged = {}
+    affected_customers = set()
+    for result in results:
+        affected_customers.update(result.pop('affected_customers', ()))
+        result.pop('partition', None)
+        for key, value in result.items():
+            merged[key] = merged.get(key, 0) + value
+
+    if kind == CUSTOMERS and merged.get('customers_created'):
+        reset_customer_sequence()
+    if affected_customers:
+        batch_size = settings.INGESTION_CHUNK_SIZE
+        customer_ids = sorted(affected_customers)
+        for i in range(0, len(customer_ids), batch_size):
+            batch = customer_ids[i:i + batch_size]
+            with transaction.atomic():
+                rebuild_profiles(batch)
+                refresh_debt(batch)
+            invalidate_customers(batch)
+
+    elapsed = time.time() - started
+    merged['partitions'] = len(results)
+    merged['seconds'] = round(elapsed, 3)
+    merged['rows_per_second'] = round(merged.get('total_processed', 0) / elapsed, 2) if elapsed else 0.0
+
+    combined = dict(previous or {})
+    combined[kind] = merged
+    combined['status'] = 'SUCCESS'
+    logger.info(f"{kind.capitalize()} ingestion completed: {merged}")
+
+    progress.publish(job_id, 'stage_complete', {'stage': kind, 'result': merged})
+    if final:
+        progress.publish(job_id, 'complete', combined)
+    return combined
+
+
+@shared_task(bind=True)
+def rescore_portfolio(self, batch_size=5000):
+    """
+    Nightly rescoring of every customer into the CreditScore table
+    """
+    try:
+        logger.info("Starting portfolio rescoring")
+        distribution = run_rescoring(
+            batch_size,
+            on_batch=lambda scored: self.update_state(state='PROGRESS', meta={'scored': scored})
+        )
+        logger.info(f"Portfolio rescoring completed: {distribution}")
+        return distribution
+
+    except Exception as e:
+        logger.error(f"Error in portfolio rescoring: {str(e)}")
+        raise self.retry(exc=e, countdown=300, max_retries=3)
+
+
+@shared_task(bind=True)
+def roll_off_matured_loans(self):
+    """
+    Daily roll-off of loans past their end date from customers' current debt
+    """
+    try:
+        result = roll_off_matured()
+        logger.info(f"Loan roll-off completed: {result}")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in loan roll-off: {str(e)}")
+        raise self.retry(exc=e, countdown=300, max_retries=3)
+
+
+@shared_task
+def purge_idempotency_keys():
+    """
+    Hourly removal of create_loan idempotency keys past IDEMPOTENCY_KEY_TTL
+    """
+    deleted = purge_expired()
+    logger.info(f"Purged {deleted} expired idempotency keys")
+    return deleted
@@ -0,0 +1,37 @@
+"""Fixtures shared by the loans and utils test suites"""
+from django.test import TestCase
+from apps.customers.models import Customer
+from apps.loans.views import DECISIONS
+from apps.utils.cache import get_cache
+
+
+def create_customer(**fields):
+    """A customer earning 100000 a month with the usual 36x approved limit"""
+    return Customer.objects.create(**{
+        'first_name': 'Asha', 'last_name': 'Rao', 'age': 30, 'phone_number': '9000000001',
+        'monthly_salary': 100000, 'approved_limit': 3600000, **fields,
+    })
+
+
+def clear_caches():
+    """Empty the shared cache and this process's eligibility decisions"""
+    get_cache().clear()
+    DECISIONS.clear()
+
+
+class CustomerTestCase(TestCase):
+    """Every test starts from empty caches with one customer, self.customer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+
+    def setUp(self):
+        clear_caches()
+
+    def quote(self, **changes):
+        """A loan application for self.customer that is approved as it stands"""
+        return {'customer_id': self.customer.pk, 'loan_amount': 10000, 'interest_rate': 16, 'tenure': 12, **changes}
+
+    def post(self, path, payload, **headers):
+        return self.client.post(path, payload, content_type='application/json', **headers)
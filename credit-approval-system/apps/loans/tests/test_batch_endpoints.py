@@ -0,0 +1,107 @@
+from unittest import mock
+from apps.loans import views
+from apps.loans.models import Loan
+from apps.loans.tests.helpers import CustomerTestCase
+from apps.utils.amortization import monthly_installment
+
+
+class CreateLoansBatchTests(CustomerTestCase):
+    path = '/api/create-loans/batch/'
+
+    def test_mixed_batch_reports_each_outcome_with_207(self):
+        response = self.post(self.path, [self.quote(), self.quote(customer_id=999), self.quote(tenure=0)])
+        self.assertEqual(response.status_code, 207)
+        results = response.json()
+        self.assertEqual([result['status'] for result in results], [200, 404, 400])
+        self.assertTrue(results[0]['loan_approved'])
+        self.assertEqual(results[1]['error'], 'Customer not found')
+        self.assertIn('tenure', results[2]['errors'])
+        self.assertEqual(list(Loan.objects.values_list('loan_id', flat=True)), [results[0]['loan_id']])
+
+    def test_all_approved_batch_is_200(self):
+        response = self.post(self.path, [self.quote(), self.quote(loan_amount=20000)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Loan.objects.count(), 2)
+
+    def test_salary_limit_counts_loans_approved_earlier_in_the_batch(self):
+        # Each EMI is about 22212: two fit within half the salary, a third does not
+        response = self.post(self.path, [self.quote(loan_amount=250000, interest_rate=12)] * 3)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([result['loan_approved'] for result in results], [True, True, False])
+        self.assertEqual(results[2]['message'], 'EMI exceeds 50% of monthly salary')
+        self.assertEqual(Loan.objects.count(), 2)
+
+    def test_salary_limit_counts_existing_loans(self):
+        self.post('/api/create-loan/', self.quote(loan_amount=400000, interest_rate=12))
+        response = self.post(self.path, [self.quote(loan_amount=400000, interest_rate=12)])
+        self.assertFalse(response.json()[0]['loan_approved'])
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_unpriceable_application_fails_alone(self):
+        def installment(amount, rate, tenure):
+            if tenure == 24:
+                raise ZeroDivisionError
+            return monthly_installment(amount, rate, tenure)
+
+        with mock.patch.object(views, 'monthly_installment', side_effect=installment):
+            response = self.post(self.path, [self.quote(tenure=24), self.quote()])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            response.json()[0],
+            {'status': 400, 'customer_id': self.customer.pk, 'error': 'Monthly installment cannot be computed'},
+        )
+        self.assertEqual(response.json()[1]['status'], 200)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_oversized_batch_is_rejected(self):
+        with self.settings(CREATE_LOANS_BATCH_MAX_SIZE=2):
+            response = self.post(self.path, [self.quote()] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Loan.objects.count(), 0)
+
+    def test_body_must_be_a_list(self):
+        self.assertEqual(self.post(self.path, self.quote()).status_code, 400)
+
+
+class CheckEligibilityBatchTests(CustomerTestCase):
+    path = '/api/check-eligibility/batch/'
+
+    def test_known_and_unknown_customers_are_answered_in_order(self):
+        response = self.post(self.path, [self.quote(), self.quote(customer_id=999)])
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()
+        self.assertEqual((first['customer_id'], first['approval'], first['tenure']), (self.customer.pk, True, 12))
+        self.assertEqual(float(first['monthly_installment']), float(monthly_installment(10000, 16, 12)))
+        self.assertEqual(second, {'customer_id': 999, 'error': 'Customer not found'})
+
+    def test_batch_answers_match_the_single_endpoint(self):
+        self.customer.monthly_salary = 10 ** 9
+        self.customer.save()
+        quotes = [
+            self.quote(),
+            # Reported by review: the float path rounded this to .62
+            self.quote(loan_amount='711211163.10', interest_rate='0.01', tenure=2),
+            self.quote(loan_amount='9999999999999.99', interest_rate='0.01', tenure=1),
+            self.quote(loan_amount='4445297630282.79', interest_rate='0.03', tenure=6),
+            # EMIs of exactly half a cent and 12.5 cents
+            self.quote(loan_amount='0.01', interest_rate=0, tenure=2),
+            self.quote(loan_amount='1.00', interest_rate=0, tenure=8),
+        ]
+        single = [self.post('/api/check-eligibility/', quote).json() for quote in quotes]
+        self.assertEqual(self.post(self.path, quotes).json(), single)
+
+    def test_invalid_quotes_are_reported_per_item(self):
+        response = self.post(self.path, [self.quote(), self.quote(tenure=0), self.quote(loan_amount=-1)])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('tenure', errors[1])
+        self.assertIn('loan_amount', errors[2])
+
+    def test_oversized_batch_is_rejected_before_validation(self):
+        with self.settings(ELIGIBILITY_BATCH_MAX_SIZE=2), \
+                mock.patch.object(views, 'LoanEligibilitySerializer') as serializer:
+            response = self.post(self.path, [self.quote()] * 3)
+        self.assertEqual(response.status_code, 400)
+        serializer.assert_not_called()
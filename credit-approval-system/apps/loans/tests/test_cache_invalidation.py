@@ -0,0 +1,87 @@
+from datetime import date
+from unittest import mock
+import pandas as pd
+from apps.customers.models import Customer
+from apps.loans import views
+from apps.loans.models import Loan
+from apps.loans.scoring import cached_credit_score, record_loan
+from apps.loans.tests.helpers import CustomerTestCase
+from apps.utils.cache import invalidate_loans
+from apps.utils.data_ingestion import load_loans
+
+
+class CacheInvalidationTests(CustomerTestCase):
+    """
+    Cached reads must not outlive the writes they depend on. Versions are
+    bumped once a write commits, so every write here runs with its commit
+    callbacks executed.
+    """
+
+    def add_loan(self, loan_id=1, loan_amount=50000):
+        with self.captureOnCommitCallbacks(execute=True):
+            loan = Loan.objects.create(
+                loan_id=loan_id, customer=self.customer, loan_amount=loan_amount, tenure=12, interest_rate=12,
+                monthly_payment=4442, emis_paid_on_time=12, start_date=date(2020, 1, 1), end_date=date(2021, 1, 1),
+            )
+            record_loan(loan)
+        return loan
+
+    def create_loan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('/api/create-loan/', self.quote())
+        self.assertTrue(response.json()['loan_approved'])
+        return response.json()['loan_id']
+
+    def view_loans(self):
+        return self.client.get(f'/api/view-loans/{self.customer.pk}/').json()
+
+    def view_loan(self, loan_id):
+        return self.client.get(f'/api/view-loan/{loan_id}/').json()
+
+    def test_view_loans_sees_a_loan_created_through_the_api(self):
+        self.assertEqual(self.view_loans(), [])
+        # Served from the cache now
+        with self.assertNumQueries(0):
+            self.assertEqual(self.view_loans(), [])
+
+        loan_id = self.create_loan()
+        self.assertEqual([loan['loan_id'] for loan in self.view_loans()], [loan_id])
+
+    def test_view_loan_sees_an_ingested_update(self):
+        self.add_loan(loan_id=7, loan_amount=50000)
+        self.assertEqual(float(self.view_loan(7)['loan_amount']), 50000)
+        with self.assertNumQueries(0):
+            self.view_loan(7)
+
+        update = pd.DataFrame([{
+            'customer_id': self.customer.pk, 'loan_id': 7, 'loan_amount': 75000, 'tenure': 12,
+            'interest_rate': 12, 'monthly_repayment': 6663, 'emis_paid_on_time': 12,
+            'start_date': '2020-01-01', 'end_date': '2021-01-01',
+        }])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(load_loans([update])['loans_updated'], 1)
+        self.assertEqual(float(self.view_loan(7)['loan_amount']), 75000)
+
+    def test_view_loan_does_not_cache_rows_older_than_its_versions(self):
+        self.add_loan(loan_id=7, loan_amount=50000)
+        real_load = views.load_loan_detail
+
+        def load_then_concurrent_update(loan_id):
+            detail = real_load(loan_id)
+            # Another request commits an update right after the rows were read
+            Loan.objects.filter(pk=loan_id).update(loan_amount=60000)
+            invalidate_loans([loan_id])
+            return detail
+
+        with mock.patch.object(views, 'load_loan_detail', side_effect=load_then_concurrent_update):
+            self.assertEqual(float(self.view_loan(7)['loan_amount']), 50000)
+        self.assertEqual(float(self.view_loan(7)['loan_amount']), 60000)
+
+    def test_cached_credit_score_changes_after_a_new_loan(self):
+        self.assertEqual(cached_credit_score(self.customer), 50)
+        self.assertEqual(cached_credit_score(self.customer), 50)
+
+        self.create_loan()
+        customer = Customer.objects.get(pk=self.customer.pk)
+        # 0 of 12 EMIs paid on time: 15 + 20 + 20 + 15 + 10
+        self.assertEqual(cached_credit_score(customer), 80)
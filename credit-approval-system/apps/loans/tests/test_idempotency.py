@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.utils import timezone
+from apps.loans.idempotency import purge_expired
+from apps.loans.models import IdempotencyKey, Loan
+from apps.loans.tests.helpers import CustomerTestCase
+
+
+class CreateLoanIdempotencyTests(CustomerTestCase):
+
+    def create_loan(self, payload, key='key-1'):
+        return self.post('/api/create-loan/', payload, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_same_key_and_body_replays_the_stored_response(self):
+        first = self.create_loan(self.quote())
+        self.assertTrue(first.json()['loan_approved'])
+
+        # 12.5 and 12.50 alike: the validated request is what is compared
+        retry = self.create_loan({**self.quote(), 'interest_rate': '16.00'})
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_same_key_with_another_body_is_rejected(self):
+        self.create_loan(self.quote())
+        response = self.create_loan({**self.quote(), 'loan_amount': 20000})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_expired_key_is_processed_again(self):
+        first = self.create_loan(self.quote())
+        IdempotencyKey.objects.filter(key='key-1').update(created_at=timezone.now() - timedelta(days=2))
+
+        with self.settings(IDEMPOTENCY_KEY_TTL=24 * 60 * 60):
+            second = self.create_loan(self.quote())
+        self.assertFalse(second.has_header('Idempotent-Replayed'))
+        self.assertNotEqual(second.json()['loan_id'], first.json()['loan_id'])
+        self.assertEqual(Loan.objects.count(), 2)
+        # The key now holds the second outcome, within its TTL again
+        self.assertEqual(self.create_loan(self.quote()).content, second.content)
+
+    def test_other_keys_are_independent(self):
+        self.create_loan(self.quote())
+        self.create_loan(self.quote(), key='key-2')
+        self.assertEqual(Loan.objects.count(), 2)
+
+    def test_purge_expired_deletes_only_old_keys(self):
+        self.create_loan(self.quote())
+        self.create_loan(self.quote(), key='key-2')
+        IdempotencyKey.objects.filter(key='key-1').update(created_at=timezone.now() - timedelta(days=2))
+        with self.settings(IDEMPOTENCY_KEY_TTL=24 * 60 * 60):
+            self.assertEqual(purge_expired(), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
+
+
+class CreateLoanExposureTests(CustomerTestCase):
+
+    def test_loans_that_together_exceed_half_the_salary_are_not_both_approved(self):
+        # Each EMI is about 35540, within 50000 alone but not together
+        quote = self.quote(loan_amount=400000, interest_rate=12)
+        first = self.post('/api/create-loan/', quote)
+        second = self.post('/api/create-loan/', quote)
+
+        self.assertTrue(first.json()['loan_approved'])
+        self.assertFalse(second.json()['loan_approved'])
+        self.assertEqual(second.json()['message'], 'EMI exceeds 50% of monthly salary')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from apps.customers.models import Customer
+from apps.loans.exposure import refresh_debt
+from apps.loans.models import Loan
+from apps.loans.rescoring import parity_mismatches, rescore_portfolio
+from apps.loans.scoring import calculate_credit_score, rebuild_profiles
+from apps.utils.data_ingestion import load_customers, load_loans
+from apps.utils.readers import read_batches
+
+
+class RescoringParityTests(TestCase):
+    """The vectorized rules must score every customer as the request path does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        this_year = date(today.year, 1, 1)
+        cls.loan_id = 0
+        cls.loans = []
+
+        cls.no_loans = cls.customer(salary=40000)
+        cls.debt_over_limit = cls.customer(salary=30000, opening_debt=2000000)
+        cls.add_loans(cls.debt_over_limit, [(100000, 12, 12, this_year - timedelta(days=400))])
+        # Opening debt plus the running loan is exactly 30% of the limit; the debt rule is <=
+        cls.debt_at_threshold = cls.customer(salary=50000, opening_debt=Decimal('490000'))
+        cls.add_loans(cls.debt_at_threshold, [(50000, 12, 12, this_year - timedelta(days=700))])
+
+        cls.current_year_heavy = cls.customer(salary=80000)
+        cls.add_loans(cls.current_year_heavy, [
+            (50000, 6, 6, this_year),
+            (50000, 6, 6, this_year + timedelta(days=1)),
+            (50000, 6, 6, this_year + timedelta(days=2)),
+            # Last day of the previous year does not count towards this one
+            (50000, 6, 6, this_year - timedelta(days=1)),
+        ])
+        # 19 of 20 EMIs on time is exactly 95%, which does not beat 95
+        cls.on_time_boundary = cls.customer(salary=60000)
+        cls.add_loans(cls.on_time_boundary, [
+            (100000, 10, 10, this_year - timedelta(days=800)),
+            (100000, 10, 9, this_year - timedelta(days=500)),
+        ])
+        # Total principal exactly half of the approved limit, then just above it
+        cls.volume_at_half = cls.customer(salary=10000)
+        cls.add_loans(cls.volume_at_half, [(180000, 24, 24, this_year - timedelta(days=900))])
+        cls.volume_over_half = cls.customer(salary=10000)
+        cls.add_loans(cls.volume_over_half, [(Decimal('180000.01'), 24, 24, this_year - timedelta(days=900))])
+
+        cls.many_loans = cls.customer(salary=200000)
+        cls.add_loans(cls.many_loans, [
+            (25000, 12, 12 - index % 3, this_year - timedelta(days=200 * index)) for index in range(1, 8)
+        ])
+        # Ingested loans can have an empty tenure, leaving no EMIs to judge
+        cls.no_emis = cls.customer(salary=45000)
+        cls.add_loans(cls.no_emis, [(30000, 0, 0, this_year - timedelta(days=100))])
+
+        Loan.objects.bulk_create(cls.loans)
+        customer_ids = list(Customer.objects.values_list('customer_id', flat=True))
+        refresh_debt(customer_ids)
+        # The request path builds missing profiles on demand
+        rebuild_profiles([pk for pk in customer_ids if pk != cls.many_loans.pk])
+
+    @classmethod
+    def customer(cls, salary, opening_debt=0):
+        number = Customer.objects.count() + 1
+        return Customer.objects.create(
+            first_name='Test', last_name=f'Customer{number}', age=35, phone_number=f'90000000{number:02d}',
+            monthly_salary=salary, approved_limit=salary * 36, opening_debt=opening_debt,
+        )
+
+    @classmethod
+    def add_loans(cls, customer, loans):
+        for amount, tenure, paid_on_time, start_date in loans:
+            cls.loan_id += 1
+            cls.loans.append(Loan(
+                loan_id=cls.loan_id, customer=customer, loan_amount=amount, tenure=tenure,
+                interest_rate=12, monthly_payment=1000, emis_paid_on_time=paid_on_time,
+                start_date=start_date, end_date=start_date + timedelta(days=30 * tenure),
+            ))
+
+    def test_edge_cases_reach_distinct_rules(self):
+        scores = {
+            name: calculate_credit_score(Customer.objects.get(pk=getattr(self, name).pk))
+            for name in ('no_loans', 'debt_over_limit', 'debt_at_threshold', 'on_time_boundary',
+                         'volume_at_half', 'volume_over_half', 'current_year_heavy', 'no_emis')
+        }
+        self.assertEqual(scores['no_loans'], 50)
+        self.assertEqual(scores['debt_over_limit'] + 5, scores['debt_at_threshold'])
+        self.assertEqual(scores['volume_over_half'] + 5, scores['volume_at_half'])
+        self.assertEqual(scores['on_time_boundary'], 25 + 20 + 20 + 15 + 10)
+        self.assertEqual(scores['current_year_heavy'], 35 + 15 + 10 + 15 + 10)
+        self.assertEqual(scores['no_emis'], 20 + 20 + 20 + 15 + 10)
+
+    def test_vectorized_scores_match_the_request_path(self):
+        # A batch size below the customer count also covers the keyset pages
+        for batch_size in (3, 5000):
+            self.assertEqual(parity_mismatches(batch_size), [])
+
+    def test_check_parity_command_passes(self):
+        out = StringIO()
+        call_command('rescore_portfolio', check_parity=True, batch_size=4, stdout=out)
+        self.assertIn('match the request path for every customer', out.getvalue())
+
+    def test_rescoring_covers_every_customer(self):
+        distribution = rescore_portfolio(batch_size=4)
+        self.assertEqual(distribution['customers'], Customer.objects.count())
+
+
+class SampleDataParityTests(TestCase):
+    """Parity on the sample files shipped in data/, loaded by the ingestion engine"""
+
+    @classmethod
+    def setUpTestData(cls):
+        load_customers(read_batches(settings.BASE_DIR / 'data' / 'customer_data.xlsx'))
+        load_loans(read_batches(settings.BASE_DIR / 'data' / 'loan_data.xlsx'))
+
+    def test_vectorized_scores_match_the_request_path(self):
+        self.assertTrue(Loan.objects.exists())
+        self.assertEqual(parity_mismatches(), [])
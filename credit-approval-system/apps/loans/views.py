@@ -2,67 +2,49 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
 from decimal import Decimal
 from datetime import datetime, timedelta
+from itertools import count
 from .models import Customer, Loan
 from .serializers import CustomerRegistrationSerializer, LoanEligibilitySerializer, LoanSerializer
+from django.conf import settings
 from django.core.files.storage import default_storage
-from .tasks import ingest_customer_data, ingest_loan_data
+from django.db import IntegrityError, transaction
+from .tasks import start_ingestion
+from apps.utils.cache import (
+    LRUCache, customer_version_key, get_cache, get_versions, invalidate_customers, loan_version_key, read_through,
+    record,
+)
+from apps.utils import progress
+from apps.utils.db_router import replica_reads
+from apps.utils.renderers import respond
+from apps.utils.readers import detect_format
+from . import idempotency
+from .exposure import active_emis, refresh_debt
+from .id_allocator import discard_block, next_loan_id, reserve_loan_ids
+from .scoring import (
+    cached_credit_score, credit_score_from_features, customers_with_scores, get_loan_features, rebuild_profiles,
+    record_loan,
+)
+from .eligibility import eligibility_decision, evaluate_quotes
+from apps.utils.amortization import iter_schedule, monthly_installment
 import os
 
-def calculate_credit_score(customer):
-    """Calculate credit score based on loan history"""
-    loans = Loan.objects.filter(customer=customer)
-    
-    if not loans.exists():
-        return 50  # Default score for new customers
-    
-    # Component 1: Past loans paid on time (35% weight)
-    total_emis = sum(loan.tenure for loan in loans)
-    paid_on_time = sum(loan.emis_paid_on_time for loan in loans)
-    
-    if total_emis > 0:
-        on_time_percentage = (paid_on_time / total_emis) * 100
-        if on_time_percentage > 95:
-            component1 = 35
-        elif on_time_percentage > 90:
-            component1 = 25
-        else:
-            component1 = 15
-    else:
-        component1 = 20
-    
-    # Component 2: Number of loans (20% weight)
-    loan_count = loans.count()
-    if loan_count <= 2:
-        component2 = 20
-    elif loan_count <= 5:
-        component2 = 15
-    else:
-        component2 = 10
-    
-    # Component 3: Current year activity (20% weight)
-    current_year = datetime.now().year
-    current_year_loans = loans.filter(start_date__year=current_year).count()
-    if current_year_loans <= 2:
-        component3 = 20
-    else:
-        component3 = 10
-    
-    # Component 4: Loan volume (15% weight)
-    total_amount = sum(loan.loan_amount for loan in loans)
-    if total_amount <= customer.approved_limit * Decimal('0.5'):
-        component4 = 15
-    else:
-        component4 = 10
-    
-    # Component 5: Current debt (10% weight)
-    if customer.current_debt <= customer.approved_limit * Decimal('0.3'):
-        component5 = 10
-    else:
-        component5 = 5
-    
-    return min(component1 + component2 + component3 + component4 + component5, 100)
+LOAN_ID_ATTEMPTS = 3
+
+VIEW_LOAN_FIELDS = (
+    'loan_id', 'loan_amount', 'interest_rate', 'monthly_payment', 'tenure',
+    'customer__customer_id', 'customer__first_name', 'customer__last_name',
+    'customer__phone_number', 'customer__age',
+)
+
+# Decisions for quotes seen recently by this process; clients re-send the
+# same quote many times while adjusting it
+DECISIONS = LRUCache('eligibility_decision', settings.ELIGIBILITY_DECISION_CACHE_SIZE)
 
 @api_view(['POST'])
 def register_customer(request):
@@ -83,163 +65,559 @@ def register_customer(request):
 def check_eligibility(request):
     serializer = LoanEligibilitySerializer(data=request.data)
     if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return respond(request, serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     data = serializer.validated_data
-    try:
-        customer = Customer.objects.get(customer_id=data['customer_id'])
-    except Customer.DoesNotExist:
-        return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+    version_key = customer_version_key(data['customer_id'])
+    key = decision_key(data, get_versions([version_key])[version_key])
+    decision = DECISIONS.get(key)
+    if decision is None:
+        with replica_reads([version_key]):
+            try:
+                customer = Customer.objects.get(customer_id=data['customer_id'])
+            except Customer.DoesNotExist:
+                return respond(request, {'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+            decision = quote_decision(customer, cached_credit_score(customer), data)
+        DECISIONS.set(key, decision)
     
-    credit_score = calculate_credit_score(customer)
+    return respond(request, decision['eligibility'])
+
+def decision_key(data, version):
+    """
+    DECISIONS key of a validated quote.
+    
+    Any write to the customer or its loans bumps `version`, and scores
+    move with the date, so older entries simply stop being looked up.
+    Amounts and rates are Decimals, so 12.5 and 12.50 share an entry.
+    """
+    return (
+        data['customer_id'], version, datetime.now().date(),
+        data['loan_amount'], data['interest_rate'], data['tenure'],
+    )
+
+def quote_decision(customer, credit_score, data):
+    """What check_eligibility and create_loan's pre-checks need to know about a quote"""
+    return {
+        'credit_score': credit_score,
+        'monthly_installment': monthly_installment(data['loan_amount'], data['interest_rate'], data['tenure']),
+        'eligibility': eligibility_payload(customer, credit_score, data),
+    }
+
+def eligibility_payload(customer, credit_score, data):
+    """check_eligibility response for a validated quote"""
     loan_amount = data['loan_amount']
     tenure = data['tenure']
     interest_rate = data['interest_rate']
     
-    # Calculate EMI
-    monthly_rate = interest_rate / (12 * 100)
-    if monthly_rate == 0:
-        monthly_emi = loan_amount / tenure
-    else:
-        monthly_emi = (loan_amount * monthly_rate * (1 + monthly_rate)**tenure) / ((1 + monthly_rate)**tenure - 1)
-    
-    monthly_emi = round(float(monthly_emi), 2)
-    
-    # Determine approval
-    approval = False
-    corrected_interest_rate = interest_rate
-    
-    if credit_score > 50:
-        if monthly_emi <= customer.monthly_salary * Decimal('0.5'):
-            approval = True
-            if credit_score > 75:
-                corrected_interest_rate = 10.0
-            elif credit_score > 50:
-                corrected_interest_rate = 12.0
-            else:
-                corrected_interest_rate = 16.0
-    elif credit_score > 30:
-        corrected_interest_rate = 16.0
-        if monthly_emi <= customer.monthly_salary * Decimal('0.5'):
-            approval = True
+    monthly_emi = float(monthly_installment(loan_amount, interest_rate, tenure))
+    approval, corrected_interest_rate = eligibility_decision(
+        credit_score, monthly_emi, customer.monthly_salary, interest_rate
+    )
     
-    return Response({
+    return {
         'customer_id': customer.customer_id,
         'approval': approval,
         'interest_rate': float(interest_rate),
         'corrected_interest_rate': float(corrected_interest_rate),
         'tenure': tenure,
         'monthly_installment': monthly_emi
-    })
+    }
+
+@api_view(['POST'])
+def check_eligibility_batch(request):
+    """
+    Evaluate many eligibility quotes in one request
+    """
+    # Refuse oversized batches before validating every quote in them
+    if isinstance(request.data, list) and len(request.data) > settings.ELIGIBILITY_BATCH_MAX_SIZE:
+        return Response({
+            'error': f'At most {settings.ELIGIBILITY_BATCH_MAX_SIZE} quotes are allowed per batch'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = LoanEligibilitySerializer(data=request.data, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    quotes = serializer.validated_data
+    customer_ids = {quote['customer_id'] for quote in quotes}
+    with replica_reads([customer_version_key(customer_id) for customer_id in customer_ids]):
+        customers = customers_with_scores(customer_ids)
+    known = [quote for quote in quotes if quote['customer_id'] in customers]
+    emis, approvals, corrected_rates = evaluate_quotes(
+        [quote['loan_amount'] for quote in known],
+        [quote['interest_rate'] for quote in known],
+        [quote['tenure'] for quote in known],
+        [customers[quote['customer_id']].credit_score for quote in known],
+        [customers[quote['customer_id']].monthly_salary for quote in known],
+    )
+    decisions = iter(zip(emis, approvals, corrected_rates))
+    
+    results = []
+    for quote in quotes:
+        if quote['customer_id'] not in customers:
+            results.append({'customer_id': quote['customer_id'], 'error': 'Customer not found'})
+            continue
+        monthly_emi, approval, corrected_interest_rate = next(decisions)
+        results.append({
+            'customer_id': quote['customer_id'],
+            'approval': approval,
+            'interest_rate': float(quote['interest_rate']),
+            'corrected_interest_rate': corrected_interest_rate,
+            'tenure': quote['tenure'],
+            'monthly_installment': monthly_emi
+        })
+    
+    return Response(results)
 
 @api_view(['POST'])
 def create_loan(request):
+    """
+    Approve and book a loan.
+    
+    Send an Idempotency-Key header to make retries safe: a repeated key
+    gets the first attempt's response back instead of another loan.
+    """
     serializer = LoanEligibilitySerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     data = serializer.validated_data
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    fingerprint = None
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= idempotency.KEY_MAX_LENGTH:
+            return Response({
+                'error': f'{idempotency.IDEMPOTENCY_HEADER} must be 1 to {idempotency.KEY_MAX_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        fingerprint = idempotency.request_fingerprint(data)
+        replayed = idempotency.replay(idempotency_key, fingerprint)
+        if replayed is not None:
+            return replayed
+    
+    version_key = customer_version_key(data['customer_id'])
+    key = decision_key(data, get_versions([version_key])[version_key])
     try:
         customer = Customer.objects.get(customer_id=data['customer_id'])
     except Customer.DoesNotExist:
         return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    credit_score = calculate_credit_score(customer)
+    decision = DECISIONS.get(key)
+    if decision is None:
+        decision = quote_decision(customer, cached_credit_score(customer), data)
+        DECISIONS.set(key, decision)
+    monthly_emi = decision['monthly_installment']
     
-    if credit_score <= 30:
-        return Response({
-            'loan_id': None,
-            'customer_id': customer.customer_id,
-            'loan_approved': False,
-            'message': 'Credit score too low'
-        })
+    result = loan_rejection(customer, decision['credit_score'], monthly_emi)
+    if result is not None:
+        if idempotency_key is not None:
+            replayed = idempotency.save_or_replay(idempotency_key, fingerprint, result)
+            if replayed is not None:
+                return replayed
+        return Response(result)
     
-    # Calculate EMI and check eligibility
-    loan_amount = data['loan_amount']
-    tenure = data['tenure']
-    interest_rate = data['interest_rate']
+    # The quote passed on possibly cached data. Re-check and book it with
+    # the customer row locked, so concurrent loans for one customer are
+    # decided one after the other while other customers are unaffected.
+    # An id from a block reserved before ingested loans claimed it can
+    # collide once, so retry with a fresh block.
+    for attempt in range(LOAN_ID_ATTEMPTS):
+        # Allocate outside the transaction so the sequence row is never held by it
+        loan_id = next_loan_id()
+        try:
+            with transaction.atomic():
+                try:
+                    customer = Customer.objects.select_for_update().get(customer_id=data['customer_id'])
+                except Customer.DoesNotExist:
+                    return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+                if idempotency_key is not None:
+                    # A concurrent retry may have finished while this one waited for the lock
+                    replayed = idempotency.replay(idempotency_key, fingerprint)
+                    if replayed is not None:
+                        return replayed
+                
+                credit_score = credit_score_from_features(customer, get_loan_features(customer.customer_id))
+                # EMIs of loans booked by requests that held the lock before this one count too
+                current_emis = active_emis([customer.customer_id]).get(customer.customer_id, Decimal('0'))
+                result = loan_rejection(customer, credit_score, monthly_emi, current_emis)
+                if result is None:
+                    result = book_loan(customer, data, loan_id, monthly_emi)
+                if idempotency_key is not None:
+                    idempotency.save(idempotency_key, fingerprint, result)
+            break
+        except IntegrityError:
+            if idempotency_key is not None:
+                # Another request stored this key first
+                replayed = idempotency.replay(idempotency_key, fingerprint)
+                if replayed is not None:
+                    return replayed
+            discard_block()
+            if attempt == LOAN_ID_ATTEMPTS - 1:
+                raise
     
-    monthly_rate = interest_rate / (12 * 100)
-    if monthly_rate == 0:
-        monthly_emi = loan_amount / tenure
-    else:
-        monthly_emi = (loan_amount * monthly_rate * (1 + monthly_rate)**tenure) / ((1 + monthly_rate)**tenure - 1)
-    
-    if monthly_emi > customer.monthly_salary * Decimal('0.5'):
-        return Response({
-            'loan_id': None,
-            'customer_id': customer.customer_id,
-            'loan_approved': False,
-            'message': 'EMI exceeds 50% of monthly salary'
-        })
+    return Response(result)
+
+def loan_rejection(customer, credit_score, monthly_emi, current_emis=Decimal('0')):
+    """
+    create_loan response refusing the loan, or None if it can be granted.
     
-    # Create loan
-    loan = Loan.objects.create(
-        loan_id=Loan.objects.count() + 1,
+    current_emis is what the customer already pays each month on active
+    loans; together with the new EMI it must stay within half the salary.
+    """
+    if credit_score <= 30:
+        message = 'Credit score too low'
+    # Check the EMIs against the salary
+    elif current_emis + monthly_emi > customer.monthly_salary * Decimal('0.5'):
+        message = 'EMI exceeds 50% of monthly salary'
+    else:
+        return None
+    return {
+        'loan_id': None,
+        'customer_id': customer.customer_id,
+        'loan_approved': False,
+        'message': message
+    }
+
+def new_loan(customer, data, loan_id, monthly_emi):
+    """Unsaved Loan for an approved application, starting today"""
+    today = datetime.now().date()
+    return Loan(
+        loan_id=loan_id,
         customer=customer,
-        loan_amount=loan_amount,
-        tenure=tenure,
-        interest_rate=interest_rate,
-        monthly_payment=round(float(monthly_emi), 2),
-        start_date=datetime.now().date(),
-        end_date=datetime.now().date() + timedelta(days=30 * tenure)
+        loan_amount=data['loan_amount'],
+        tenure=data['tenure'],
+        interest_rate=data['interest_rate'],
+        monthly_payment=monthly_emi,
+        start_date=today,
+        end_date=today + timedelta(days=30 * data['tenure'])
     )
-    
-    return Response({
+
+def approval_payload(loan):
+    return {
         'loan_id': loan.loan_id,
-        'customer_id': customer.customer_id,
+        'customer_id': loan.customer_id,
         'loan_approved': True,
         'message': 'Loan approved successfully',
         'monthly_installment': loan.monthly_payment
-    })
+    }
 
-@api_view(['GET'])
-def view_loan(request, loan_id):
-    try:
-        loan = Loan.objects.get(loan_id=loan_id)
-    except Loan.DoesNotExist:
-        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+def book_loan(customer, data, loan_id, monthly_emi):
+    """
+    Insert an approved loan and fold it into the customer's credit profile
+    and current debt; must run inside the caller's transaction
+    """
+    loan = new_loan(customer, data, loan_id, monthly_emi)
+    loan.save(force_insert=True)
+    record_loan(loan)
+    return approval_payload(loan)
+
+@api_view(['POST'])
+def create_loans_batch(request):
+    """
+    Book many loan applications in one request.
     
-    return Response({
+    Applications are decided in order with create_loan's rules, each one
+    seeing the loans approved before it in the same batch, so the outcome
+    is what sending them one at a time would give. Every result carries
+    its own status; the response is 207 unless all of them are 200.
+    Idempotency-Key works as for create_loan.
+    """
+    if not isinstance(request.data, list):
+        return Response({'error': 'Expected a list of loan applications'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(request.data) > settings.CREATE_LOANS_BATCH_MAX_SIZE:
+        return Response({
+            'error': f'At most {settings.CREATE_LOANS_BATCH_MAX_SIZE} applications are allowed per batch'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = [LoanEligibilitySerializer(data=item) for item in request.data]
+    valid = [serializer.is_valid() for serializer in items]
+    applications = [
+        (index, serializer.validated_data)
+        for index, (serializer, is_valid) in enumerate(zip(items, valid))
+        if is_valid
+    ]
+    
+    idempotency_key = request.headers.get(idempotency.IDEMPOTENCY_HEADER)
+    fingerprint = None
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= idempotency.KEY_MAX_LENGTH:
+            return Response({
+                'error': f'{idempotency.IDEMPOTENCY_HEADER} must be 1 to {idempotency.KEY_MAX_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        fingerprint = idempotency.request_fingerprint([
+            serializer.validated_data if is_valid else serializer.initial_data
+            for serializer, is_valid in zip(items, valid)
+        ])
+        replayed = idempotency.replay(idempotency_key, fingerprint)
+        if replayed is not None:
+            return replayed
+    
+    for attempt in range(LOAN_ID_ATTEMPTS):
+        # One block of ids for the whole batch, reserved before the
+        # transaction like next_loan_id's; rejected applications leave
+        # their share unused
+        first_loan_id = reserve_loan_ids(len(applications)) if applications else None
+        try:
+            with transaction.atomic():
+                if idempotency_key is not None:
+                    replayed = idempotency.replay(idempotency_key, fingerprint)
+                    if replayed is not None:
+                        return replayed
+                outcomes = book_loans(applications, first_loan_id)
+                results = []
+                for index, (serializer, is_valid) in enumerate(zip(items, valid)):
+                    if is_valid:
+                        item_status, payload = outcomes[index]
+                    else:
+                        item_status, payload = status.HTTP_400_BAD_REQUEST, {'errors': serializer.errors}
+                    results.append({'status': item_status, **payload})
+                
+                response_status = status.HTTP_200_OK
+                if any(result['status'] != status.HTTP_200_OK for result in results):
+                    response_status = status.HTTP_207_MULTI_STATUS
+                if idempotency_key is not None:
+                    idempotency.save(idempotency_key, fingerprint, results, response_status)
+            break
+        except IntegrityError:
+            if idempotency_key is not None:
+                replayed = idempotency.replay(idempotency_key, fingerprint)
+                if replayed is not None:
+                    return replayed
+            # An id in the block was claimed by ingested loans; take a fresh block
+            if attempt == LOAN_ID_ATTEMPTS - 1:
+                raise
+    
+    return Response(results, status=response_status)
+
+def book_loans(applications, first_loan_id):
+    """
+    Decide and insert validated (index, application) pairs in order.
+    
+    The customers involved are locked and scored in bulk, approved loans
+    are folded into their in-memory profile, debt and monthly payments
+    before the next application is decided, then inserted with one
+    bulk_create and taken into the stored profiles and debt set-based.
+    Returns index -> (status, payload); must run inside the caller's
+    transaction.
+    """
+    if not applications:
+        return {}
+    today = datetime.now().date()
+    customers = customers_with_scores({data['customer_id'] for _, data in applications}, lock=True)
+    # Monthly payments per customer, growing with each approval in the batch
+    current_emis = active_emis(customers)
+    loan_ids = count(first_loan_id)
+    
+    loans, outcomes = [], {}
+    for index, data in applications:
+        customer = customers.get(data['customer_id'])
+        if customer is None:
+            outcomes[index] = (
+                status.HTTP_404_NOT_FOUND, {'customer_id': data['customer_id'], 'error': 'Customer not found'}
+            )
+            continue
+        try:
+            monthly_emi = monthly_installment(data['loan_amount'], data['interest_rate'], data['tenure'])
+        except ArithmeticError:
+            # One unpriceable application must not fail the rest of the batch
+            outcomes[index] = (
+                status.HTTP_400_BAD_REQUEST,
+                {'customer_id': customer.customer_id, 'error': 'Monthly installment cannot be computed'},
+            )
+            continue
+        profile = customer.credit_profile
+        credit_score = credit_score_from_features(customer, profile.features(today))
+        customer_emis = current_emis.get(customer.customer_id, Decimal('0'))
+        rejection = loan_rejection(customer, credit_score, monthly_emi, customer_emis)
+        if rejection is not None:
+            outcomes[index] = (status.HTTP_200_OK, rejection)
+            continue
+        
+        loan = new_loan(customer, data, next(loan_ids), monthly_emi)
+        profile.add_loan(loan)
+        customer.current_debt += loan.loan_amount
+        current_emis[customer.customer_id] = customer_emis + monthly_emi
+        loans.append(loan)
+        outcomes[index] = (status.HTTP_200_OK, approval_payload(loan))
+    
+    if loans:
+        Loan.objects.bulk_create(loans)
+        # bulk_create sends no signals, so refresh and invalidate here
+        affected_customers = {loan.customer_id for loan in loans}
+        rebuild_profiles(affected_customers, today)
+        refresh_debt(affected_customers)
+        transaction.on_commit(lambda: invalidate_customers(affected_customers))
+    return outcomes
+
+def loan_owner_queryset(loan_id):
+    return Loan.objects.filter(loan_id=loan_id).values_list('customer_id', flat=True)
+
+def loan_detail_queryset(loan_id):
+    return Loan.objects.select_related('customer').only(*VIEW_LOAN_FIELDS).filter(loan_id=loan_id)
+
+def loan_detail_payload(loan):
+    """view_loan payload and owning customer id of a loan from loan_detail_queryset"""
+    customer = loan.customer
+    return customer.customer_id, {
         'loan_id': loan.loan_id,
         'customer': {
-            'id': loan.customer.customer_id,
-            'first_name': loan.customer.first_name,
-            'last_name': loan.customer.last_name,
-            'phone_number': loan.customer.phone_number,
-            'age': loan.customer.age
+            'id': customer.customer_id,
+            'first_name': customer.first_name,
+            'last_name': customer.last_name,
+            'phone_number': customer.phone_number,
+            'age': customer.age
         },
         'loan_amount': loan.loan_amount,
         'interest_rate': loan.interest_rate,
         'monthly_installment': loan.monthly_payment,
         'tenure': loan.tenure
-    })
+    }
 
-@api_view(['GET'])
-def view_loans(request, customer_id):
+def load_loan_detail(loan_id):
+    """view_loan payload and owning customer id, or None if the loan does not exist"""
     try:
-        customer = Customer.objects.get(customer_id=customer_id)
-    except Customer.DoesNotExist:
-        return Response([], status=status.HTTP_200_OK)
+        loan = loan_detail_queryset(loan_id).get()
+    except Loan.DoesNotExist:
+        return None
+    return loan_detail_payload(loan)
+
+def loan_page_queryset(customer_id, cursor, page_size):
+    # Keyset pagination: one indexed range scan, no customer lookup and no OFFSET
+    return (
+        Loan.objects.filter(customer_id=customer_id, loan_id__gt=cursor)
+        .order_by('loan_id')
+        .values('loan_id', 'loan_amount', 'interest_rate', 'monthly_payment', 'tenure', 'emis_paid_on_time')[:page_size + 1]
+    )
+
+def loan_page_payload(loans, page_size):
+    """Page payload from up to page_size + 1 rows of loan_page_queryset"""
+    has_more = len(loans) > page_size
+    loans = loans[:page_size]
     
-    loans = Loan.objects.filter(customer=customer)
     loan_data = []
-    
     for loan in loans:
         loan_data.append({
-            'loan_id': loan.loan_id,
-            'loan_amount': loan.loan_amount,
-            'interest_rate': loan.interest_rate,
-            'monthly_installment': loan.monthly_payment,
-            'repayments_left': max(0, loan.tenure - loan.emis_paid_on_time)
+            'loan_id': loan['loan_id'],
+            'loan_amount': loan['loan_amount'],
+            'interest_rate': loan['interest_rate'],
+            'monthly_installment': loan['monthly_payment'],
+            'repayments_left': max(0, loan['tenure'] - loan['emis_paid_on_time'])
         })
+    return {'loans': loan_data, 'next_cursor': loans[-1]['loan_id'] if has_more else None}
+
+def load_loan_page(customer_id, cursor, page_size):
+    """One keyset page of a customer's loans plus the cursor of the next page"""
+    return loan_page_payload(list(loan_page_queryset(customer_id, cursor, page_size)), page_size)
+
+def parse_page_params(params):
+    """(cursor, page_size) of a view_loans request, page_size clamped; ValueError if not integers"""
+    page_size = int(params.get('page_size', settings.VIEW_LOANS_PAGE_SIZE))
+    cursor = int(params.get('cursor', 0))
+    return cursor, max(1, min(page_size, settings.VIEW_LOANS_MAX_PAGE_SIZE))
+
+def add_page_headers(response, path, page, page_size):
+    if page['next_cursor'] is not None:
+        response['X-Next-Cursor'] = str(page['next_cursor'])
+        response['Link'] = f'<{path}?cursor={page["next_cursor"]}&page_size={page_size}>; rel="next"'
+    return response
+
+@api_view(['GET'])
+def view_loan(request, loan_id):
+    # The entry records the loan and customer versions it was built from.
+    # Both are read before the rows, so a write committed in between bumps
+    # them past what the entry is stored under instead of hiding in it.
+    cache = get_cache()
+    cache_key = f'view_loan:{loan_id}'
+    loan_key = loan_version_key(loan_id)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        customer_id = entry['customer_id']
+        versions = get_versions([loan_key, customer_version_key(customer_id)])
+        if versions == entry['versions']:
+            record('view_loan', hit=True)
+            return respond(request, entry['data'])
+    record('view_loan', hit=False)
+    
+    with replica_reads([loan_key]):
+        if entry is None:
+            # The owner is needed for its version; one primary-key lookup
+            customer_id = loan_owner_queryset(loan_id).first()
+            if customer_id is None:
+                return respond(request, {'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+            versions = get_versions([loan_key, customer_version_key(customer_id)])
+        detail = load_loan_detail(loan_id)
+    if detail is None:
+        return respond(request, {'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    owner, data = detail
+    if owner == customer_id:
+        cache.set(cache_key, {'customer_id': owner, 'versions': versions, 'data': data}, settings.API_CACHE_TTL)
+    else:
+        # The loan moved to another customer; the next request starts over
+        cache.delete(cache_key)
+    return respond(request, data)
+
+@api_view(['GET'])
+def view_loans(request, customer_id):
+    """
+    List a customer's loans one page at a time, ordered by loan_id.
+    
+    Pass the X-Next-Cursor header of a response back as ?cursor= to get
+    the next page; the header is absent on the last page.
+    """
+    try:
+        cursor, page_size = parse_page_params(request.GET)
+    except ValueError:
+        return respond(request, {'error': 'cursor and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    version_key = customer_version_key(customer_id)
+    version = get_versions([version_key])[version_key]
+    with replica_reads([version_key]):
+        page = read_through(
+            'view_loans',
+            f'view_loans:{customer_id}:{version}:{cursor}:{page_size}',
+            lambda: load_loan_page(customer_id, cursor, page_size),
+        )
+    
+    return add_page_headers(respond(request, page['loans']), request.path, page, page_size)
+
+@api_view(['GET'])
+def view_loan_schedule(request, loan_id):
+    """
+    Month-by-month repayment schedule of a loan.
+    
+    With ?stream=1 the rows are generated and sent in blocks, so long
+    tenures never build the whole schedule in memory.
+    """
+    try:
+        loan = Loan.objects.only('loan_id', 'loan_amount', 'interest_rate', 'tenure', 'monthly_payment').get(loan_id=loan_id)
+    except Loan.DoesNotExist:
+        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    header = {
+        'loan_id': loan.loan_id,
+        'loan_amount': loan.loan_amount,
+        'interest_rate': loan.interest_rate,
+        'tenure': loan.tenure,
+        'monthly_installment': loan.monthly_payment,
+    }
+    rows = iter_schedule(loan.loan_amount, loan.interest_rate, loan.tenure, loan.monthly_payment)
     
-    return Response(loan_data) 
+    if request.GET.get('stream') in ('1', 'true'):
+        return StreamingHttpResponse(stream_schedule(header, rows), content_type='application/json')
+    return Response({**header, 'schedule': list(rows)})
+
+def stream_schedule(header, rows):
+    """Emit the same JSON document as the non-streaming response, row by row"""
+    encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    yield encoder.encode(header)[:-1] + ',"schedule":['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + encoder.encode(row)
+    yield ']}'
 
 @api_view(['POST'])
 def ingest_data(request):
     """
-    API endpoint to trigger data ingestion from Excel files
+    API endpoint to trigger data ingestion from Excel, CSV or Parquet files
     """
     try:
         # Handle file uploads
@@ -248,22 +626,27 @@ def ingest_data(request):
         
         if not customer_file or not loan_file:
             return Response({
-                'error': 'Both customer_data and loan_data Excel files are required'
+                'error': 'Both customer_data and loan_data files are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Excel, CSV and Parquet uploads are told apart by their content
+        customer_format = detect_format(customer_file)
+        loan_format = detect_format(loan_file)
+        
         # Save uploaded files
         customer_path = default_storage.save(f'uploads/{customer_file.name}', customer_file)
         loan_path = default_storage.save(f'uploads/{loan_file.name}', loan_file)
         
-        # Trigger background tasks
-        customer_task = ingest_customer_data.delay(customer_path)
-        loan_task = ingest_loan_data.delay(loan_path)
+        # Customers are loaded in parallel partitions first, then loans
+        job = start_ingestion(
+            customer_path, loan_path, customer_format=customer_format, loan_format=loan_format
+        )
         
         return Response({
             'message': 'Data ingestion started',
-            'customer_task_id': customer_task.id,
-            'loan_task_id': loan_task.id,
-            'status_url': '/api/ingestion-status/'
+            'job_id': job.id,
+            'status_url': f'/api/ingestion-status/?job_id={job.id}',
+            'progress_url': f'/api/ingestion-progress/{job.id}/'
         }, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
@@ -271,21 +654,61 @@ def ingest_data(request):
             'error': f'Failed to start data ingestion: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# A plain Django view: DRF content negotiation would reject EventSource's
+# "Accept: text/event-stream"
+@require_GET
+def ingestion_progress(request, job_id):
+    """
+    Stream an ingestion job's progress as Server-Sent Events.
+
+    Replays the job's events so far, then pushes new ones until the job
+    completes or fails. Reconnecting clients resume from Last-Event-ID;
+    an id this channel could not have issued replays from the start.
+    Under WSGI each stream holds a worker thread, so it is closed after
+    INGESTION_PROGRESS_WSGI_MAX_SECONDS and the client reconnects.
+    """
+    last_event_id = progress.parse_event_id(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    )
+    if isinstance(request, ASGIRequest):
+        # Under ASGI a sync iterator would be drained before anything is sent
+        events = progress.asse_events(str(job_id), last_event_id)
+    else:
+        events = progress.sse_events(
+            str(job_id), last_event_id, max_seconds=settings.INGESTION_PROGRESS_WSGI_MAX_SECONDS
+        )
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['GET'])
 def ingestion_status(request):
     """
     Check the status of data ingestion tasks
     """
+    from celery.result import AsyncResult
+    
+    job_id = request.GET.get('job_id')
+    if job_id:
+        job_result = AsyncResult(job_id)
+        return Response({
+            'job': {
+                'id': job_id,
+                'status': job_result.status,
+                'result': job_result.result if job_result.successful() else None
+            }
+        })
+    
     customer_task_id = request.GET.get('customer_task_id')
     loan_task_id = request.GET.get('loan_task_id')
     
     if not customer_task_id or not loan_task_id:
         return Response({
-            'error': 'Both customer_task_id and loan_task_id are required'
+            'error': 'Either job_id or both customer_task_id and loan_task_id are required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    from celery.result import AsyncResult
-    
     customer_result = AsyncResult(customer_task_id)
     loan_result = AsyncResult(loan_task_id)
     
@@ -0,0 +1,183 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+import numpy as np
+
+CENT = Decimal('0.01')
+
+# Months computed per block when a schedule is generated lazily
+SCHEDULE_BLOCK_MONTHS = 120
+
+# Distinct off-grid (interest rate, tenure) pairs whose annuity factor is kept
+ANNUITY_CACHE_SIZE = 4096
+
+# Grid of the annuity factor table: every quarter percent up to 24% a
+# year, every tenure up to six years, then whole years up to thirty
+ANNUITY_GRID_RATES = [Decimal(quarter) / 4 for quarter in range(1, 24 * 4 + 1)]
+ANNUITY_GRID_TENURES = list(range(1, 73)) + list(range(84, 361, 12))
+
+
+def to_cents(value):
+    """Round a money figure to cents, half away from zero"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    # Adding zero turns a -0.00 left by float noise into 0.00
+    return value.quantize(CENT, rounding=ROUND_HALF_UP) + 0
+
+
+def compute_annuity_factor(interest_rate, tenure):
+    """
+    EMI per unit of principal, r(1+r)^n / ((1+r)^n - 1), in Decimal.
+
+    interest_rate is the yearly percentage as a Decimal and tenure an int.
+    None for a zero rate.
+    """
+    monthly_rate = interest_rate / (Decimal('12') * Decimal('100'))
+    if monthly_rate == 0:
+        return None
+    growth = (1 + monthly_rate) ** tenure
+    return monthly_rate * growth / (growth - 1)
+
+
+cached_annuity_factor = lru_cache(maxsize=ANNUITY_CACHE_SIZE)(compute_annuity_factor)
+
+# Built once at import; Decimal keys compare by value, so 12.5 and 12.50 share an entry
+ANNUITY_TABLE = {
+    (rate, tenure): compute_annuity_factor(rate, tenure)
+    for rate in ANNUITY_GRID_RATES
+    for tenure in ANNUITY_GRID_TENURES
+}
+
+
+def annuity_factor(interest_rate, tenure):
+    """
+    compute_annuity_factor from the precomputed grid, or from a memo of
+    off-grid pairs, so the Decimal power is paid at most once per pair
+    """
+    try:
+        return ANNUITY_TABLE[interest_rate, tenure]
+    except KeyError:
+        return cached_annuity_factor(interest_rate, tenure)
+
+
+def monthly_installment(loan_amount, interest_rate, tenure):
+    """
+    EMI of a loan, computed in Decimal and rounded to cents.
+
+    This is the single EMI implementation; interest_rate is the yearly
+    percentage and tenure the number of monthly payments.
+    """
+    if not isinstance(loan_amount, Decimal):
+        loan_amount = Decimal(str(loan_amount))
+    if not isinstance(interest_rate, Decimal):
+        interest_rate = Decimal(str(interest_rate))
+    tenure = int(tenure)
+    factor = annuity_factor(interest_rate, tenure)
+
+    if factor is None:
+        return to_cents(loan_amount / tenure)
+    return to_cents(loan_amount * factor)
+
+
+def monthly_installments(loan_amounts, interest_rates, tenures):
+    """
+    Unrounded float64 EMIs for many loans at once.
+
+    Callers round to cents themselves and settle results within float
+    error of a half cent with monthly_installment, as evaluate_quotes does.
+    """
+    amount = np.asarray(loan_amounts, dtype=np.float64)
+    monthly_rate = np.asarray(interest_rates, dtype=np.float64) / (12 * 100)
+    tenure = np.asarray(tenures, dtype=np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + monthly_rate) ** tenure
+        return np.where(
+            monthly_rate == 0,
+            amount / tenure,
+            amount * monthly_rate * growth / (growth - 1),
+        )
+
+
+def schedule_arrays(loan_amounts, interest_rates, tenures, installments=None, first_month=1, last_month=None):
+    """
+    Vectorized amortization for many loans over months first_month..last_month.
+
+    Returns float64 arrays of shape (loans, months): installment, interest,
+    principal and closing balance, plus a `paid` mask that is False past a
+    loan's tenure. `installments` defaults to monthly_installment of each
+    loan; the final month of each loan absorbs the rounding so the balance
+    closes at exactly zero.
+    """
+    amount = np.asarray(loan_amounts, dtype=np.float64)[:, None]
+    monthly_rate = (np.asarray(interest_rates, dtype=np.float64) / (12 * 100))[:, None]
+    tenure = np.asarray(tenures, dtype=np.int64)[:, None]
+    if installments is None:
+        installments = [
+            monthly_installment(*terms) for terms in zip(loan_amounts, interest_rates, tenures)
+        ]
+    emi = np.asarray(installments, dtype=np.float64)[:, None]
+
+    last_month = last_month or int(tenure.max(initial=0))
+    months = np.arange(first_month - 1, last_month + 1)[None, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + monthly_rate) ** months
+        balances = np.where(
+            monthly_rate == 0,
+            amount - emi * months,
+            amount * growth - emi * (growth - 1) / monthly_rate,
+        )
+    opening, balance = balances[:, :-1], balances[:, 1:]
+    months = months[:, 1:]
+
+    interest = opening * monthly_rate
+    principal = emi - interest
+    installment = np.broadcast_to(emi, balance.shape)
+
+    final = months == tenure
+    principal = np.where(final, opening, principal)
+    installment = np.where(final, opening + interest, installment)
+    balance = np.where(final, 0.0, balance)
+
+    return {
+        'month': np.broadcast_to(months, balance.shape),
+        'installment': installment,
+        'interest': interest,
+        'principal': principal,
+        'balance': balance,
+        'paid': months <= tenure,
+    }
+
+
+def iter_schedule(loan_amount, interest_rate, tenure, installment=None, block_months=SCHEDULE_BLOCK_MONTHS):
+    """
+    Yield one loan's schedule month by month, computing it in blocks.
+
+    Balances and installments are rounded to cents in Decimal; principal
+    is the drop in the rounded balance and interest the rest of the
+    installment, so the rows always add up to the loan amount exactly.
+    """
+    installments = None if installment is None else [installment]
+    opening = to_cents(loan_amount)
+    for first_month in range(1, int(tenure) + 1, block_months):
+        last_month = min(first_month + block_months - 1, int(tenure))
+        block = schedule_arrays(
+            [loan_amount], [interest_rate], [tenure], installments, first_month, last_month
+        )
+        for i in range(last_month - first_month + 1):
+            payment = to_cents(block['installment'][0, i])
+            balance = to_cents(block['balance'][0, i])
+            principal = opening - balance
+            yield {
+                'month': int(block['month'][0, i]),
+                'installment': payment,
+                'principal': principal,
+                'interest': payment - principal,
+                'balance': balance,
+            }
+            opening = balance
+
+
+def amortization_schedule(loan_amount, interest_rate, tenure, installment=None):
+    """Full month-by-month schedule of one loan as a list of rows"""
+    return list(iter_schedule(loan_amount, interest_rate, tenure, installment))
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def customer_version_key(customer_id):
+    return f'version:customer:{customer_id}'
+
+
+def loan_version_key(loan_id):
+    return f'version:loan:{loan_id}'
+
+
+def recent_write_key(version_key):
+    return f'recent_write:{version_key}'
+
+
+def get_versions(keys):
+    """
+    Current values of version counters, creating missing ones.
+
+    A missing counter (never set, or evicted) starts at the current time in
+    nanoseconds, so it can never fall back to a value an older entry was
+    stored under.
+    """
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+async def aget_versions(keys):
+    """get_versions for async views"""
+    cache = get_cache()
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return versions
+
+
+def bump_versions(keys):
+    """Invalidate every entry stored under the current value of these counters"""
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+    # Replicas may lag the write that caused this; replica_reads checks these
+    if settings.DATABASE_REPLICAS and settings.DB_REPLICA_PIN_SECONDS:
+        cache.set_many(
+            {recent_write_key(key): 1 for key in keys}, timeout=settings.DB_REPLICA_PIN_SECONDS
+        )
+
+
+def recently_written(keys):
+    """Whether any of these version counters was bumped within DB_REPLICA_PIN_SECONDS"""
+    if not keys:
+        return False
+    return bool(get_cache().get_many([recent_write_key(key) for key in keys]))
+
+
+async def arecently_written(keys):
+    """recently_written for async views"""
+    if not keys:
+        return False
+    return bool(await get_cache().aget_many([recent_write_key(key) for key in keys]))
+
+
+def invalidate_customers(customer_ids):
+    bump_versions([customer_version_key(customer_id) for customer_id in customer_ids])
+
+
+def invalidate_loans(loan_ids):
+    bump_versions([loan_version_key(loan_id) for loan_id in loan_ids])
+
+
+def record(name, hit):
+    with _stats_lock:
+        (_hits if hit else _misses)[name] += 1
+
+
+def read_through(name, key, build, timeout=None):
+    """
+    Return the cached value for key, or build, store and return it.
+
+    `name` groups the hit/miss counters. The key must already embed every
+    version it depends on.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        record(name, hit=True)
+        return value
+    record(name, hit=False)
+    value = build()
+    cache.set(key, value, timeout if timeout is not None else settings.API_CACHE_TTL)
+    return value
+
+
+async def aread_through(name, key, build, timeout=None):
+    """read_through for async views; `build` is a coroutine function"""
+    cache = get_cache()
+    value = await cache.aget(key)
+    if value is not None:
+        record(name, hit=True)
+        return value
+    record(name, hit=False)
+    value = await build()
+    await cache.aset(key, value, timeout if timeout is not None else settings.API_CACHE_TTL)
+    return value
+
+
+class LRUCache:
+    """
+    Bounded in-process mapping that evicts the least recently used entry.
+
+    For small values read on every request, where even a shared cache
+    round trip shows. Keys must embed every version they depend on;
+    hits and misses count under `name` like read_through's.
+    """
+
+    def __init__(self, name, max_entries):
+        self.name = name
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+        record(self.name, hit=value is not None)
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def stats():
+    """Per-cache hit and miss counts for this process"""
+    with _stats_lock:
+        return {
+            name: {'hits': _hits[name], 'misses': _misses[name]}
+            for name in sorted(set(_hits) | set(_misses))
+        }
@@ -1,63 +1,333 @@
+import hashlib
+import logging
 import pandas as pd
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import date
+from decimal import Decimal
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
 from apps.customers.models import Customer
+from apps.loans.exposure import is_matured, refresh_debt
+from apps.loans.id_allocator import advance_past
 from apps.loans.models import Loan
+from apps.loans.scoring import rebuild_profiles
+from .cache import invalidate_customers, invalidate_loans
+from .readers import read_batches
 
-def ingest_customer_data(file_path):
-    """Ingest customer data from Excel file"""
+logger = logging.getLogger(__name__)
+
+
+def _decimal(value, default=0):
+    if value is None or pd.isna(value):
+        value = default
+    return Decimal(str(value))
+
+
+def _phone(value):
+    # Excel hands phone numbers back as ints, or floats when the column has gaps
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+# Fields rewritten when a re-ingested row's content hash has changed
+CUSTOMER_UPDATE_FIELDS = [
+    'first_name', 'last_name', 'age', 'phone_number', 'monthly_salary',
+    'approved_limit', 'opening_debt', 'current_debt', 'row_hash', 'updated_at',
+]
+LOAN_UPDATE_FIELDS = [
+    'customer', 'loan_amount', 'tenure', 'interest_rate', 'monthly_payment',
+    'emis_paid_on_time', 'start_date', 'end_date', 'rolled_off', 'row_hash',
+]
+
+# Rows per UPDATE statement issued by bulk_update
+UPDATE_BATCH_SIZE = 1000
+# Times a chunk is written before a conflicting concurrent insert fails the load
+CHUNK_ATTEMPTS = 3
+
+
+def _canonical(value):
+    if isinstance(value, Decimal):
+        return f'{value:.2f}'
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def row_hash(values):
+    """
+    Content hash of a record's ingested field values.
+
+    Values are hashed after conversion to model types, so the same record
+    hashes the same whether it came from xlsx, CSV or Parquet.
+    """
+    canonical = '\x1f'.join(f'{field}={_canonical(values[field])}' for field in sorted(values))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def _unique(chunk, key):
+    """Keep the last row of each key, as a later row in a file supersedes an earlier one"""
+    unique = chunk.drop_duplicates(subset=key, keep='last')
+    return unique, len(chunk) - len(unique)
+
+
+def _customer_values(row):
+    return {
+        'customer_id': int(row['customer_id']),
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'age': int(row.get('age', 25)),
+        'phone_number': _phone(row['phone_number']),
+        'monthly_salary': _decimal(row['monthly_salary']),
+        'approved_limit': _decimal(row['approved_limit']),
+        # The file's current debt is what the customer owes outside this system
+        'opening_debt': _decimal(row.get('current_debt', 0)),
+    }
+
+
+def load_customers(chunks, on_progress=None):
+    """
+    Upsert customers from DataFrame chunks by content hash.
+
+    Each chunk costs one query to fetch the stored hashes of its ids, then
+    one batched insert for new customers and batched updates for customers
+    whose content changed; unchanged rows are not written. Every chunk
+    commits in its own transaction, and is written again from a fresh
+    hash lookup if another writer inserted one of its ids first.
+    on_progress(processed, counts) is called after each chunk commits,
+    with the chunk's read/written/rejected row counts.
+    """
+    created = updated = unchanged = duplicates = processed = 0
+
+    for chunk in chunks:
+        rows, chunk_duplicates = _unique(chunk, 'customer_id')
+        records = {}
+        for row in rows.to_dict('records'):
+            values = _customer_values(row)
+            values['row_hash'] = row_hash(values)
+            records[values['customer_id']] = values
+
+        inserted, changed = _with_chunk_retries(lambda: _write_customers(records))
+
+        created += inserted
+        updated += changed
+        unchanged += len(records) - inserted - changed
+        duplicates += chunk_duplicates
+        processed += len(chunk)
+        if on_progress:
+            on_progress(processed, {'read': len(chunk), 'written': inserted + changed, 'rejected': 0})
+
+    if created:
+        reset_customer_sequence()
+
+    return {
+        'customers_created': created,
+        'customers_updated': updated,
+        'customers_unchanged': unchanged,
+        'duplicate_rows': duplicates,
+        'total_processed': processed,
+    }
+
+
+def _with_chunk_retries(write):
+    """
+    Run write() in its own transaction, again if it hits a row another
+    writer inserted after write() looked it up: a loan booked through the
+    API, or the same id in another partition of a parallel load. Only rows
+    that were actually written are ever counted.
+    """
+    for attempt in range(CHUNK_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return write()
+        except IntegrityError:
+            if attempt == CHUNK_ATTEMPTS - 1:
+                raise
+            logger.warning('Ingestion chunk conflicted with a concurrent insert; retrying it')
+
+
+def _write_customers(records):
+    """Insert new and update changed customers; returns how many of each were written"""
+    stored = dict(Customer.objects.filter(pk__in=records).values_list('pk', 'row_hash'))
+    now = timezone.now()
+    inserts = [
+        Customer(**values, current_debt=values['opening_debt'])
+        for pk, values in records.items()
+        if pk not in stored
+    ]
+    # Swap the old opening debt for the new one, keeping the loans' share
+    changes = [
+        Customer(
+            **values,
+            current_debt=F('current_debt') - F('opening_debt') + values['opening_debt'],
+            updated_at=now,
+        )
+        for pk, values in records.items()
+        if pk in stored and stored[pk] != values['row_hash']
+    ]
+    Customer.objects.bulk_create(inserts)
+    Customer.objects.bulk_update(changes, CUSTOMER_UPDATE_FIELDS, batch_size=UPDATE_BATCH_SIZE)
+    # Bulk writes send no signals, so invalidate cached reads here
+    written_ids = [customer.customer_id for customer in inserts + changes]
+    transaction.on_commit(lambda ids=written_ids: invalidate_customers(ids))
+    return len(inserts), len(changes)
+
+
+def load_loans(chunks, on_progress=None, timer=None, defer_profiles=False, include_unchanged=False):
+    """
+    Upsert loans from DataFrame chunks by content hash, skipping loans
+    whose customer is unknown.
+
+    Each chunk resolves customers and stored hashes with one query each,
+    inserts new loans and updates changed ones in batches, and rebuilds the
+    credit profiles and current debt of the customers whose loans were
+    written, all in its own transaction, retried as in load_customers.
+    Loans that have already ended are stored rolled off. Profile rebuilds
+    are charged to the 'profiles' stage of `timer` when one is given, and
+    on_progress is called as in load_customers; loans of unknown customers
+    count as rejected.
+
+    With defer_profiles the rebuilds are left to the caller, which gets the
+    touched customer ids back as 'affected_customers'. Partitions of one
+    file loaded in parallel use this, because concurrent rebuilds of the
+    same customer could each miss the other's uncommitted loans.
+    include_unchanged also reports the owners of unchanged loans, for a
+    retried partition whose earlier attempt committed some chunks.
+    """
+    created = updated = unchanged = skipped = duplicates = processed = 0
+    touched = set()
+    today = date.today()
+
+    for chunk in chunks:
+        rows, chunk_duplicates = _unique(chunk, 'loan_id')
+        counts = _with_chunk_retries(lambda: _write_loans(rows, today, timer, defer_profiles, include_unchanged))
+        if defer_profiles:
+            touched |= counts['affected_customers']
+
+        created += counts['inserted']
+        updated += counts['changed']
+        unchanged += counts['records'] - counts['inserted'] - counts['changed']
+        skipped += counts['orphaned']
+        duplicates += chunk_duplicates
+        processed += len(chunk)
+        if on_progress:
+            on_progress(processed, {
+                'read': len(chunk), 'written': counts['inserted'] + counts['changed'], 'rejected': counts['orphaned']
+            })
+
+    result = {
+        'loans_created': created,
+        'loans_updated': updated,
+        'loans_unchanged': unchanged,
+        'loans_skipped': skipped,
+        'duplicate_rows': duplicates,
+        'total_processed': processed,
+    }
+    if defer_profiles:
+        result['affected_customers'] = sorted(touched)
+    return result
+
+
+def _write_loans(rows, today, timer, defer_profiles, include_unchanged):
+    """
+    Write one deduplicated chunk of loan rows as load_loans describes.
+
+    Returns the counts of records, inserted, changed and orphaned rows and
+    the customers whose loans were written.
+    """
+    customer_ids = {int(value) for value in rows['customer_id']}
+    known_customers = set(
+        Customer.objects.filter(customer_id__in=customer_ids).values_list('customer_id', flat=True)
+    )
+    orphaned = rows[~rows['customer_id'].isin(known_customers)]
+    for row in orphaned.to_dict('records'):
+        logger.warning(f"Customer {row['customer_id']} not found for loan {row['loan_id']}")
+    rows = rows[rows['customer_id'].isin(known_customers)]
+
+    start_dates = pd.to_datetime(rows['start_date']).dt.date
+    end_dates = pd.to_datetime(rows['end_date']).dt.date
+    records = {}
+    for row, start_date, end_date in zip(rows.to_dict('records'), start_dates, end_dates):
+        values = {
+            'loan_id': int(row['loan_id']),
+            'customer_id': int(row['customer_id']),
+            'loan_amount': _decimal(row['loan_amount']),
+            'tenure': int(row['tenure']),
+            'interest_rate': _decimal(row['interest_rate']),
+            'monthly_payment': _decimal(row['monthly_repayment']),
+            'emis_paid_on_time': int(row['emis_paid_on_time']),
+            'start_date': start_date,
+            'end_date': end_date,
+        }
+        values['row_hash'] = row_hash(values)
+        values['rolled_off'] = is_matured(end_date, today)
+        records[values['loan_id']] = values
+
+    stored = {
+        loan_id: (stored_hash, owner)
+        for loan_id, stored_hash, owner in Loan.objects.filter(pk__in=records).values_list(
+            'pk', 'row_hash', 'customer_id'
+        )
+    }
+    inserts = [Loan(**values) for pk, values in records.items() if pk not in stored]
+    changes = [
+        Loan(**values)
+        for pk, values in records.items()
+        if pk in stored and stored[pk][0] != values['row_hash']
+    ]
+    Loan.objects.bulk_create(inserts)
+    Loan.objects.bulk_update(changes, LOAN_UPDATE_FIELDS, batch_size=UPDATE_BATCH_SIZE)
+
+    # A loan moved to another customer changes both profiles
+    affected_customers = {loan.customer_id for loan in inserts + changes}
+    affected_customers |= {stored[loan.loan_id][1] for loan in changes}
+    if include_unchanged:
+        affected_customers |= {values['customer_id'] for values in records.values()}
+    if changes:
+        changed_ids = [loan.loan_id for loan in changes]
+        transaction.on_commit(lambda ids=changed_ids: invalidate_loans(ids))
+    if not defer_profiles:
+        with timer.stage('profiles') if timer else nullcontext():
+            rebuild_profiles(affected_customers)
+            refresh_debt(affected_customers)
+        transaction.on_commit(lambda ids=affected_customers: invalidate_customers(ids))
+    if inserts:
+        advance_past(max(loan.loan_id for loan in inserts))
+
+    return {
+        'records': len(records),
+        'inserted': len(inserts),
+        'changed': len(changes),
+        'orphaned': len(orphaned),
+        'affected_customers': affected_customers,
+    }
+
+
+def reset_customer_sequence():
+    """Move the customer id sequence past explicitly inserted ids"""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Customer])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def ingest_customer_data(file_path, chunk_size=None, file_format=None):
+    """Ingest customer data from an Excel, CSV or Parquet file"""
     try:
-        df = pd.read_excel(file_path)
-        print(f"Found {len(df)} customer records to ingest")
-        
-        for _, row in df.iterrows():
-            Customer.objects.get_or_create(
-                customer_id=row["customer_id"],
-                defaults={
-                    "first_name": row["first_name"],
-                    "last_name": row["last_name"],
-                    "phone_number": str(row["phone_number"]),
-                    "monthly_salary": row["monthly_salary"],
-                    "approved_limit": row["approved_limit"],
-                    "current_debt": row.get("current_debt", 0),
-                    "age": row.get("age", 25)
-                }
-            )
-        print(f"Successfully ingested {len(df)} customer records")
+        print(f"Ingesting customer records from {file_path}")
+        result = load_customers(read_batches(file_path, chunk_size, file_format))
+        print(f"Successfully ingested {result['total_processed']} customer records: {result}")
     except Exception as e:
         print(f"Error ingesting customer data: {e}")
 
-def ingest_loan_data(file_path):
-    """Ingest loan data from Excel file"""
+def ingest_loan_data(file_path, chunk_size=None, file_format=None):
+    """Ingest loan data from an Excel, CSV or Parquet file"""
     try:
-        df = pd.read_excel(file_path)
-        print(f"Found {len(df)} loan records to ingest")
-        
-        for _, row in df.iterrows():
-            try:
-                customer = Customer.objects.get(customer_id=row["customer_id"])
-                
-                # Parse dates
-                start_date = pd.to_datetime(row["start_date"]).date()
-                end_date = pd.to_datetime(row["end_date"]).date()
-                
-                Loan.objects.get_or_create(
-                    loan_id=row["loan_id"],
-                    defaults={
-                        "customer": customer,
-                        "loan_amount": row["loan_amount"],
-                        "tenure": row["tenure"],
-                        "interest_rate": row["interest_rate"],
-                        "monthly_payment": row["monthly_repayment"],
-                        "emis_paid_on_time": row["emis_paid_on_time"],
-                        "start_date": start_date,
-                        "end_date": end_date,
-                    }
-                )
-            except Customer.DoesNotExist:
-                print(f"Customer {row['customer_id']} not found for loan {row['loan_id']}")
-            except Exception as e:
-                print(f"Error processing loan {row.get('loan_id', 'unknown')}: {e}")
-        
-        print(f"Successfully processed {len(df)} loan records")
+        print(f"Ingesting loan records from {file_path}")
+        result = load_loans(read_batches(file_path, chunk_size, file_format))
+        print(f"Successfully processed {result['total_processed']} loan records: {result}")
     except Exception as e:
         print(f"Error ingesting loan data: {e}")
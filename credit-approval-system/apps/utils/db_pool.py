@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the pool's timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded set of open database connections shared by every thread of a
+    process: web threads, the threads async views hop to, and Celery
+    worker threads.
+
+    At most max_size connections are open at once; acquire() opens a new
+    one through `connect` while below that, and otherwise waits up to
+    timeout seconds for one to come back before raising PoolTimeout.
+    Returned connections are reused most recent first. Connections idle
+    longer than max_idle seconds are closed, and ones idle longer than
+    check_after seconds are pinged before being handed out.
+    """
+
+    def __init__(self, check, max_size=10, timeout=10.0, max_idle=300.0, check_after=30.0):
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        # (connection, returned at), most recently returned last
+        self.idle = []
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.timeouts = 0
+
+    def acquire(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection, idle_for = self._checkout(deadline)
+            if connection is None:
+                break
+            if idle_for < self.check_after or self._usable(connection):
+                return connection
+            self.release(connection, reusable=False)
+
+        # _checkout reserved a slot for a new connection
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+        return connection
+
+    def _checkout(self, deadline):
+        with self.condition:
+            while True:
+                self._prune()
+                if self.idle:
+                    connection, returned_at = self.idle.pop()
+                    self.in_use += 1
+                    return connection, time.monotonic() - returned_at
+                if self.in_use < self.max_size:
+                    self.in_use += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection free after {self.timeout}s '
+                        f'({self.max_size} in use)'
+                    )
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def _usable(self, connection):
+        try:
+            return self.check(connection)
+        except Exception:
+            return False
+
+    def release(self, connection, reusable=True):
+        with self.condition:
+            self.in_use -= 1
+            if reusable and not connection.closed:
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self._discard(connection)
+            self.condition.notify()
+
+    def _prune(self):
+        """Close connections left idle too long; the oldest are at the front"""
+        expired = time.monotonic() - self.max_idle
+        while self.idle and (self.idle[0][1] < expired or self.idle[0][0].closed):
+            self._discard(self.idle.pop(0)[0])
+
+    def _discard(self, connection):
+        self.closed += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self.condition:
+            return {
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'waiting': self.waiting,
+                'max_size': self.max_size,
+                'created': self.created,
+                'closed': self.closed,
+                'timeouts': self.timeouts,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Connections opened per database alias, pooled or not
+_opened = {}
+
+# Pools inherited over fork() belong to the parent. Closing them here would
+# end the parent's sessions, so the child only keeps them referenced.
+_inherited = []
+
+
+def _forget_parent_pools():
+    _inherited.extend(_pools.values())
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_parent_pools)
+
+
+def get_pool(key, factory):
+    """The process-wide pool for key, created by factory on first use"""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = factory()
+    return pool
+
+
+def record_opened(alias):
+    with _pools_lock:
+        _opened[alias] = _opened.get(alias, 0) + 1
+
+
+def pool_stats():
+    """(alias, database) -> stats of every pool in this process"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {(alias, database): pool.stats() for (alias, database, _), pool in pools}
+
+
+def opened_connections():
+    with _pools_lock:
+        return dict(_opened)
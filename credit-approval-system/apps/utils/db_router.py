@@ -0,0 +1,98 @@
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from apps.utils.cache import arecently_written, recently_written
+
+# Set inside replica_reads blocks: {'primary': True} once the block wrote
+_replica_state = ContextVar('replica_state', default=None)
+
+# alias -> (healthy, monotonic time of the check)
+_health = {}
+
+
+class ReplicaRouter:
+    """
+    Send reads to a replica inside replica_reads blocks, everything else
+    to the primary.
+
+    Reads stay on the primary inside a transaction and for the rest of a
+    block once it has written, so read-modify-write code never mixes
+    lagging rows into what it writes back.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if state is None or state['primary'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state is not None:
+            state['primary'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def choose_replica():
+    """A healthy replica alias at random, or the primary when none is"""
+    healthy = [alias for alias in settings.DATABASE_REPLICAS if replica_healthy(alias)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+def replica_healthy(alias):
+    """Whether alias accepts connections, re-checked every DB_REPLICA_HEALTH_INTERVAL seconds"""
+    healthy, checked_at = _health.get(alias, (False, None))
+    now = time.monotonic()
+    if checked_at is None or now - checked_at >= settings.DB_REPLICA_HEALTH_INTERVAL:
+        healthy = _check(alias)
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def _check(alias):
+    connection = connections[alias]
+    try:
+        if connection.connection is not None:
+            return connection.is_usable()
+        connection.ensure_connection()
+        return True
+    except Exception:
+        return False
+
+
+@contextmanager
+def replica_reads(version_keys=()):
+    """
+    Let the reads in this block go to a replica.
+
+    version_keys are the cache version counters of the rows the block
+    reads; if any of them was bumped within DB_REPLICA_PIN_SECONDS the
+    replica may not have the write yet, so the block reads the primary.
+    """
+    pinned = bool(settings.DATABASE_REPLICAS) and recently_written(version_keys)
+    token = _replica_state.set({'primary': pinned})
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
+
+
+@asynccontextmanager
+async def areplica_reads(version_keys=()):
+    """replica_reads for async views"""
+    pinned = bool(settings.DATABASE_REPLICAS) and await arecently_written(version_keys)
+    token = _replica_state.set({'primary': pinned})
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
@@ -0,0 +1,318 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from apps.utils.cache import get_cache, stats as cache_stats
+from apps.utils.db_pool import opened_connections, pool_stats
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Ingestion stages exported through the shared cache; 'write' is whatever
+# part of a run is neither reading the file nor rebuilding profiles
+INGESTION_TASKS = ('ingest_customer_data', 'ingest_loan_data')
+INGESTION_STAGES = ('read', 'write', 'profiles', 'total')
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, safe to share between threads"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Cumulative counts per upper bound (ending with +Inf) and the sum"""
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative, buckets = 0, []
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets, total
+
+
+class Registry:
+    """Histograms of one metric family keyed by their label values"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(labels, Histogram(self.buckets))
+        histogram.observe(value)
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, histogram in sorted(self.histograms.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+            buckets, total = histogram.snapshot()
+            lines += [f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}' for bound, count in buckets]
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {buckets[-1][1]}')
+        return lines
+
+
+REQUEST_DURATION = Registry('api_request_duration_seconds', 'Wall time per request', DURATION_BUCKETS)
+DB_QUERIES = Registry('api_db_queries', 'Database queries per request', QUERY_BUCKETS)
+DB_DURATION = Registry('api_db_duration_seconds', 'Database time per request', DURATION_BUCKETS)
+RESPONSE_SIZE = Registry('api_response_size_bytes', 'Response body size per request', SIZE_BUCKETS)
+
+_status_lock = threading.Lock()
+_responses = {}
+
+# Query count and DB time of the request being served. Context variables
+# follow a request into the threads sync_to_async runs the ORM in, which
+# a wrapper on the request thread's own connection would not see.
+_request_db = ContextVar('request_db', default=None)
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, query count, DB time and response size per view.
+
+    Numbers are kept in this process; every worker serves its own
+    /api/metrics and Prometheus sums them. Works in both sync and async
+    middleware chains, so async views stay async under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        db = {'queries': 0, 'seconds': 0.0}
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        _observe(request, response, time.perf_counter() - started, db)
+        return response
+
+    async def __acall__(self, request):
+        db = {'queries': 0, 'seconds': 0.0}
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        _observe(request, response, time.perf_counter() - started, db)
+        return response
+
+
+def track_queries(execute, sql, params, many, context):
+    """Execute wrapper charging each query to the request being served, if any"""
+    db = _request_db.get()
+    if db is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db['queries'] += 1
+        db['seconds'] += time.perf_counter() - started
+
+
+def install_query_tracker(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper. At
+    # the front: execute_wrapper() blocks that are open while the
+    # connection is created pop the last wrapper when they exit
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, track_queries)
+
+
+connection_created.connect(install_query_tracker)
+
+
+def _observe(request, response, elapsed, db):
+    match = request.resolver_match
+    view = (match.url_name or match.view_name) if match else 'unresolved'
+    labels = (view,)
+    REQUEST_DURATION.observe(labels, elapsed)
+    DB_QUERIES.observe(labels, db['queries'])
+    DB_DURATION.observe(labels, db['seconds'])
+    # Streaming bodies are produced after this returns and are not sized
+    if not response.streaming:
+        RESPONSE_SIZE.observe(labels, len(response.content))
+
+    key = (view, f'{response.status_code // 100}xx')
+    with _status_lock:
+        _responses[key] = _responses.get(key, 0) + 1
+
+
+class StageTimer:
+    """Per-stage wall time of one ingestion run"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(INGESTION_STAGES, 0.0)
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+
+    def iterate(self, chunks, name='read'):
+        """Yield from chunks, charging the time spent producing them to a stage"""
+        chunks = iter(chunks)
+        while True:
+            with self.stage(name):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def publish(self, task, rows):
+        """
+        Add this run to the ingestion counters in the shared cache.
+
+        Celery workers run in other processes, so the API reads these back
+        from the cache rather than from process memory.
+        """
+        self.seconds['total'] = time.perf_counter() - self.started
+        self.seconds['write'] = max(
+            self.seconds['total'] - self.seconds['read'] - self.seconds['profiles'], 0.0
+        )
+        cache = get_cache()
+        for stage, seconds in self.seconds.items():
+            _add(cache, _stage_key(task, stage), int(seconds * 1_000_000))
+        _add(cache, _rows_key(task), rows)
+        _add(cache, _runs_key(task), 1)
+        rate = rows / self.seconds['total'] if self.seconds['total'] else 0.0
+        cache.set(_rate_key(task), rate, timeout=None)
+        return rate
+
+
+def _add(cache, key, amount):
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def _stage_key(task, stage):
+    return f'metrics:ingestion:{task}:{stage}:microseconds'
+
+
+def _rows_key(task):
+    return f'metrics:ingestion:{task}:rows'
+
+
+def _runs_key(task):
+    return f'metrics:ingestion:{task}:runs'
+
+
+def _rate_key(task):
+    return f'metrics:ingestion:{task}:rows_per_second'
+
+
+def _ingestion_lines():
+    keys = []
+    for task in INGESTION_TASKS:
+        keys += [_rows_key(task), _runs_key(task), _rate_key(task)]
+        keys += [_stage_key(task, stage) for stage in INGESTION_STAGES]
+    values = get_cache().get_many(keys)
+
+    lines = [
+        '# HELP ingestion_stage_seconds_total Time spent per ingestion stage',
+        '# TYPE ingestion_stage_seconds_total counter',
+    ]
+    for task in INGESTION_TASKS:
+        for stage in INGESTION_STAGES:
+            seconds = values.get(_stage_key(task, stage), 0) / 1_000_000
+            lines.append(f'ingestion_stage_seconds_total{{task="{task}",stage="{stage}"}} {seconds}')
+    for name, key, kind, help_text in (
+        ('ingestion_rows_total', _rows_key, 'counter', 'Rows processed by ingestion'),
+        ('ingestion_runs_total', _runs_key, 'counter', 'Completed ingestion runs'),
+        ('ingestion_rows_per_second', _rate_key, 'gauge', 'Throughput of the latest ingestion run'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{task="{task}"}} {values.get(key(task), 0)}' for task in INGESTION_TASKS]
+    return lines
+
+
+def _database_lines():
+    lines = ['# HELP db_connections_opened_total Database connections opened by this process',
+             '# TYPE db_connections_opened_total counter']
+    lines += [f'db_connections_opened_total{{alias="{alias}"}} {count}'
+              for alias, count in sorted(opened_connections().items())]
+
+    pools = sorted(pool_stats().items())
+    for name, field, kind, help_text in (
+        ('db_pool_connections_in_use', 'in_use', 'gauge', 'Pooled connections lent out'),
+        ('db_pool_connections_idle', 'idle', 'gauge', 'Pooled connections waiting to be reused'),
+        ('db_pool_waiting', 'waiting', 'gauge', 'Threads waiting for a pooled connection'),
+        ('db_pool_max_size', 'max_size', 'gauge', 'Connection limit of the pool'),
+        ('db_pool_connections_created_total', 'created', 'counter', 'Connections opened by the pool'),
+        ('db_pool_connections_closed_total', 'closed', 'counter', 'Connections closed by the pool'),
+        ('db_pool_timeouts_total', 'timeouts', 'counter', 'Checkouts that gave up waiting'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{{alias="{alias}",database="{database}"}} {stats[field]}'
+                  for (alias, database), stats in pools]
+    return lines
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for registry in (REQUEST_DURATION, DB_QUERIES, DB_DURATION, RESPONSE_SIZE):
+        lines += registry.render(('view',))
+
+    lines += ['# HELP api_responses_total Responses per view and status class',
+              '# TYPE api_responses_total counter']
+    with _status_lock:
+        responses = sorted(_responses.items())
+    lines += [f'api_responses_total{{view="{view}",status="{status}"}} {count}'
+              for (view, status), count in responses]
+
+    cache_counts = cache_stats()
+    for outcome in ('hits', 'misses'):
+        lines += [f'# HELP api_cache_{outcome}_total Response cache {outcome}',
+                  f'# TYPE api_cache_{outcome}_total counter']
+        lines += [f'api_cache_{outcome}_total{{cache="{name}"}} {counts[outcome]}'
+                  for name, counts in cache_counts.items()]
+    lines += ['# HELP api_cache_hit_ratio Share of lookups served from cache since start',
+              '# TYPE api_cache_hit_ratio gauge']
+    lines += [f'api_cache_hit_ratio{{cache="{name}"}} {counts["hits"] / ((counts["hits"] + counts["misses"]) or 1):.4f}'
+              for name, counts in cache_counts.items()]
+
+    lines += _database_lines()
+    lines += _ingestion_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
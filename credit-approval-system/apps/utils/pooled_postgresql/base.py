@@ -0,0 +1,71 @@
+"""
+PostgreSQL backend that borrows connections from a per-process pool.
+
+Set DATABASES[alias]['POOL'] to a dict of ConnectionPool options
+(MAX_SIZE, TIMEOUT, MAX_IDLE, CHECK_AFTER) to enable pooling; without it
+this behaves like the stock backend and only counts the connections it
+opens. With a pool, closing the Django connection hands the underlying
+one back, so CONN_MAX_AGE should be 0.
+"""
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_INERROR
+from apps.utils.db_pool import ConnectionPool, get_pool, record_opened
+
+
+def _ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if not connection.autocommit:
+        connection.rollback()
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            self.pool = None
+            return self._open(conn_params)
+
+        key = (self.alias, conn_params.get('dbname', ''), repr(sorted(conn_params.items())))
+        self.pool = get_pool(key, lambda: ConnectionPool(
+            _ping,
+            max_size=int(options.get('MAX_SIZE', 10)),
+            timeout=float(options.get('TIMEOUT', 10)),
+            max_idle=float(options.get('MAX_IDLE', 300)),
+            check_after=float(options.get('CHECK_AFTER', 30)),
+        ))
+        connection = self.pool.acquire(lambda: self._open(conn_params))
+        # The stock backend sets this while opening a connection; a reused
+        # one still carries the level it was opened with
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _open(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        record_opened(self.alias)
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        self.pool.release(connection, reusable=_reset(connection))
+
+
+def _reset(connection):
+    """Roll back whatever the borrower left open; False if it cannot be reused"""
+    if connection.closed:
+        return False
+    try:
+        status = connection.get_transaction_status()
+        if status in (TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_INERROR):
+            connection.rollback()
+            status = connection.get_transaction_status()
+        return status == TRANSACTION_STATUS_IDLE
+    except Exception:
+        return False
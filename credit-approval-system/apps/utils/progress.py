@@ -0,0 +1,322 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# Counters every progress event carries, summed over all partitions of a stage
+PROGRESS_FIELDS = ('read', 'validated', 'written', 'rejected')
+
+# Events that end a job's stream
+FINAL_EVENTS = ('complete', 'error')
+
+# Milliseconds EventSource waits before reconnecting to a closed stream
+RETRY_MS = 1000
+
+# Redis stream entry ids: milliseconds-sequence
+STREAM_ID = re.compile(r'\d+-\d+')
+
+
+class MemoryChannel:
+    """
+    In-process progress channel, used when there is no Redis (development,
+    tests and eager Celery). Only sees events published in this process.
+
+    Like the Redis keys, a job is forgotten ttl seconds after its last
+    write; past max_jobs the least recently written jobs go first, so a
+    long-lived process does not keep every job it ever ran.
+    """
+
+    def __init__(self, max_events=1000, ttl=86400, max_jobs=100):
+        self.max_events = max_events
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.condition = threading.Condition()
+        self.events = {}
+        # job_id -> stage -> counters
+        self.counters = {}
+        # job_id -> monotonic time of its last write, least recent first
+        self.written = OrderedDict()
+        self.sequence = 0
+
+    def _touch(self, job_id):
+        now = time.monotonic()
+        self.written[job_id] = now
+        self.written.move_to_end(job_id)
+        while self.written:
+            oldest, written_at = next(iter(self.written.items()))
+            if len(self.written) <= self.max_jobs and now - written_at < self.ttl:
+                break
+            del self.written[oldest]
+            self.events.pop(oldest, None)
+            self.counters.pop(oldest, None)
+
+    def increment(self, job_id, stage, deltas):
+        with self.condition:
+            self._touch(job_id)
+            counters = self.counters.setdefault(job_id, {}).setdefault(stage, {})
+            for field, value in deltas.items():
+                counters[field] = counters.get(field, 0) + value
+            return dict(counters)
+
+    def set_once(self, job_id, stage, values):
+        with self.condition:
+            self._touch(job_id)
+            counters = self.counters.setdefault(job_id, {}).setdefault(stage, {})
+            for field, value in values.items():
+                counters.setdefault(field, value)
+            return dict(counters)
+
+    def counters_for(self, job_id, stage):
+        with self.condition:
+            return dict(self.counters.get(job_id, {}).get(stage, {}))
+
+    def parse_id(self, value):
+        """value as an event id of this channel, or None if it cannot be one"""
+        return value if value and value.isdigit() else None
+
+    def publish(self, job_id, event, data):
+        with self.condition:
+            self._touch(job_id)
+            self.sequence += 1
+            events = self.events.setdefault(job_id, [])
+            events.append((str(self.sequence), event, data))
+            del events[:-self.max_events]
+            self.condition.notify_all()
+
+    def read(self, job_id, last_id=None, timeout=15):
+        """Events after last_id, waiting up to timeout seconds for the first one"""
+        last = int(last_id or 0)
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                events = [event for event in self.events.get(job_id, []) if int(event[0]) > last]
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self.condition.wait(remaining)
+
+
+class RedisChannel:
+    """
+    Progress channel on a Redis stream per job, so events written by any
+    Celery worker reach every API process and late subscribers can replay
+    the stream from the start or from Last-Event-ID.
+    """
+
+    def __init__(self, url, max_events=1000, ttl=86400):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_events = max_events
+        self.ttl = ttl
+
+    def _stream(self, job_id):
+        return f'ingestion:progress:{job_id}'
+
+    def _counters(self, job_id, stage):
+        return f'ingestion:progress:{job_id}:{stage}'
+
+    def increment(self, job_id, stage, deltas):
+        key = self._counters(job_id, stage)
+        pipe = self.client.pipeline()
+        for field, value in deltas.items():
+            pipe.hincrby(key, field, value)
+        pipe.expire(key, self.ttl)
+        pipe.hgetall(key)
+        return _decode_counters(pipe.execute()[-1])
+
+    def set_once(self, job_id, stage, values):
+        key = self._counters(job_id, stage)
+        pipe = self.client.pipeline()
+        for field, value in values.items():
+            pipe.hsetnx(key, field, value)
+        pipe.expire(key, self.ttl)
+        pipe.hgetall(key)
+        return _decode_counters(pipe.execute()[-1])
+
+    def counters_for(self, job_id, stage):
+        return _decode_counters(self.client.hgetall(self._counters(job_id, stage)))
+
+    def parse_id(self, value):
+        """value as a stream entry id, or None if it cannot be one"""
+        return value if value and STREAM_ID.fullmatch(value) else None
+
+    def publish(self, job_id, event, data):
+        stream = self._stream(job_id)
+        pipe = self.client.pipeline()
+        pipe.xadd(stream, {'event': event, 'data': json.dumps(data)},
+                  maxlen=self.max_events, approximate=True)
+        pipe.expire(stream, self.ttl)
+        pipe.execute()
+
+    def read(self, job_id, last_id=None, timeout=15):
+        response = self.client.xread(
+            {self._stream(job_id): last_id or '0-0'}, block=int(timeout * 1000)
+        )
+        events = []
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                events.append((event_id.decode(), fields[b'event'].decode(), json.loads(fields[b'data'])))
+        return events
+
+
+def _decode_counters(raw):
+    return {key.decode(): int(value) for key, value in raw.items()}
+
+
+_channel = None
+_channel_lock = threading.Lock()
+
+
+def get_channel():
+    """The process-wide progress channel: Redis when REDIS_URL is set"""
+    global _channel
+    if _channel is None:
+        with _channel_lock:
+            if _channel is None:
+                if settings.REDIS_URL:
+                    _channel = RedisChannel(settings.REDIS_URL)
+                else:
+                    _channel = MemoryChannel()
+    return _channel
+
+
+def stage_started(job_id, stage, total_rows, partitions):
+    """
+    Announce a stage and remember its size and start time for rates and
+    ETAs. Both are only set the first time, so a retried stage neither
+    doubles its total nor restarts its clock.
+    """
+    if not job_id:
+        return
+    channel = get_channel()
+    channel.set_once(job_id, stage, {'total': total_rows, 'started_ms': int(time.time() * 1000)})
+    channel.publish(job_id, 'stage', {'stage': stage, 'total': total_rows, 'partitions': partitions})
+
+
+def _partition_counters(stage, partition):
+    return f'{stage}:partition:{partition}'
+
+
+def partition_started(job_id, stage, partition):
+    """
+    Take back what an earlier attempt of a partition reported, so a
+    retried partition's rows are not counted twice. `partition` is any id
+    unique within the stage, such as its first row.
+    """
+    if not job_id:
+        return
+    channel = get_channel()
+    reported = channel.counters_for(job_id, _partition_counters(stage, partition))
+    if any(reported.values()):
+        undo = {field: -value for field, value in reported.items()}
+        channel.increment(job_id, _partition_counters(stage, partition), undo)
+        counters = channel.increment(job_id, stage, undo)
+        channel.publish(job_id, 'progress', progress_event(stage, counters))
+
+
+def report_progress(job_id, stage, read=0, written=0, rejected=0, partition=None):
+    """
+    Add one chunk's counts to a stage and publish the stage's running
+    totals; with `partition` they are also kept per partition for
+    partition_started
+    """
+    if not job_id:
+        return
+    channel = get_channel()
+    deltas = {
+        'read': read,
+        'validated': read - rejected,
+        'written': written,
+        'rejected': rejected,
+    }
+    if partition is not None:
+        channel.increment(job_id, _partition_counters(stage, partition), deltas)
+    counters = channel.increment(job_id, stage, deltas)
+    channel.publish(job_id, 'progress', progress_event(stage, counters))
+
+
+def progress_event(stage, counters):
+    elapsed = max(time.time() - counters.get('started_ms', 0) / 1000, 1e-6)
+    event = {'stage': stage}
+    event.update({field: counters.get(field, 0) for field in PROGRESS_FIELDS})
+    rate = event['read'] / elapsed
+    total = counters.get('total')
+    event['total'] = total
+    event['rows_per_second'] = round(rate, 2)
+    event['eta_seconds'] = round((total - event['read']) / rate, 1) if total and rate else None
+    return event
+
+
+def publish(job_id, event, data):
+    if job_id:
+        get_channel().publish(job_id, event, data)
+
+
+def parse_event_id(value):
+    """
+    A client's Last-Event-ID as an id of the current channel. Anything
+    else, such as an id from the other backend after a switch, gives None
+    and so a replay from the start.
+    """
+    return get_channel().parse_id(value)
+
+
+def format_event(event_id, event, data):
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def format_retry(retry_ms):
+    """Frame telling EventSource how long to wait before reconnecting"""
+    return f'retry: {retry_ms}\n\n'
+
+
+def sse_events(job_id, last_event_id=None, heartbeat=15, max_seconds=3600, retry_ms=RETRY_MS):
+    """
+    Server-Sent Events for one job: a retry interval, every stored event
+    after last_event_id, then new ones as they arrive, with a comment line
+    as heartbeat while idle. Ends after the job's final event or
+    max_seconds; a client cut off by the latter reconnects after retry_ms
+    and resumes from its Last-Event-ID.
+    """
+    channel = get_channel()
+    deadline = time.monotonic() + max_seconds
+    last_id = last_event_id
+    yield format_retry(retry_ms)
+    while (remaining := deadline - time.monotonic()) > 0:
+        events = channel.read(job_id, last_id, timeout=min(heartbeat, remaining))
+        if not events:
+            yield ': keep-alive\n\n'
+            continue
+        for event_id, event, data in events:
+            last_id = event_id
+            yield format_event(event_id, event, data)
+            if event in FINAL_EVENTS:
+                return
+
+
+async def asse_events(job_id, last_event_id=None, heartbeat=15, max_seconds=3600, retry_ms=RETRY_MS):
+    """
+    sse_events for ASGI, which only streams async iterators as they go.
+
+    Each blocking read waits in a thread of its own, so an idle stream
+    does not hold the thread sync views share.
+    """
+    channel = get_channel()
+    read = sync_to_async(channel.read, thread_sensitive=False)
+    deadline = time.monotonic() + max_seconds
+    last_id = last_event_id
+    yield format_retry(retry_ms)
+    while (remaining := deadline - time.monotonic()) > 0:
+        events = await read(job_id, last_id, timeout=min(heartbeat, remaining))
+        if not events:
+            yield ': keep-alive\n\n'
+            continue
+        for event_id, event, data in events:
+            last_id = event_id
+            yield format_event(event_id, event, data)
+            if event in FINAL_EVENTS:
+                return
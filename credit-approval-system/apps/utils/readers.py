@@ -0,0 +1,265 @@
+import io
+import os
+import pandas as pd
+from django.conf import settings
+
+XLSX = 'xlsx'
+CSV = 'csv'
+PARQUET = 'parquet'
+
+SUPPORTED_FORMATS = (XLSX, CSV, PARQUET)
+
+_EXTENSIONS = {
+    '.xlsx': XLSX,
+    '.xlsm': XLSX,
+    '.csv': CSV,
+    '.txt': CSV,
+    '.parquet': PARQUET,
+    '.pq': PARQUET,
+}
+
+
+def detect_format(source, name=None):
+    """
+    Work out the format of an ingestion file.
+
+    `source` is a path or an open binary file (such as an upload). The
+    leading bytes win over the file name: xlsx is a zip archive and Parquet
+    starts with PAR1. Anything else falls back to the extension, then CSV.
+    """
+    if hasattr(source, 'read'):
+        position = source.tell()
+        head = source.read(4)
+        source.seek(position)
+        name = name or getattr(source, 'name', None)
+    else:
+        with open(source, 'rb') as handle:
+            head = handle.read(4)
+        name = name or source
+
+    if head.startswith(b'PK\x03\x04'):
+        return XLSX
+    if head == b'PAR1':
+        return PARQUET
+    extension = os.path.splitext(name or '')[1].lower()
+    return _EXTENSIONS.get(extension, CSV)
+
+
+def read_batches(path, batch_size=None, file_format=None, start=0, stop=None, offset=None):
+    """
+    Stream an ingestion file as DataFrames of at most batch_size rows.
+
+    Only one batch is held in memory at a time, whatever the file size.
+    `start` and `stop` restrict the read to data rows [start, stop), counted
+    from zero after the header, so a file can be split between workers.
+    For CSV, `offset` is the byte position of row `start` as given by
+    partition_rows; the read then seeks there instead of parsing and
+    skipping every row before it.
+    """
+    batch_size = batch_size or settings.INGESTION_CHUNK_SIZE
+    file_format = file_format or detect_format(path)
+
+    if file_format == XLSX:
+        yield from _read_xlsx(path, batch_size, start, stop)
+    elif file_format == CSV:
+        nrows = None if stop is None else max(stop - start, 0)
+        if nrows == 0:
+            return
+        if offset is not None:
+            with open(path, 'rb') as handle:
+                source = io.BufferedReader(_HeaderAndRange(handle, offset))
+                yield from pd.read_csv(source, chunksize=batch_size, nrows=nrows)
+            return
+        skiprows = range(1, start + 1) if start else None
+        for batch in pd.read_csv(path, chunksize=batch_size, skiprows=skiprows, nrows=nrows):
+            yield batch
+    elif file_format == PARQUET:
+        yield from _read_parquet(path, batch_size, start, stop)
+    else:
+        raise ValueError(f"Unsupported ingestion file format: {file_format}")
+
+
+def count_rows(path, file_format=None):
+    """
+    Data row count from file metadata, or from one read-only pass over an
+    xlsx sheet that has no dimension record; None for CSV
+    """
+    file_format = file_format or detect_format(path)
+
+    if file_format == XLSX:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            sheet = workbook.active
+            max_row = sheet.max_row
+            if max_row is None:
+                # No <dimension> record to read it from; count the rows instead
+                max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0)
+    if file_format == PARQUET:
+        return _parquet_file(path).metadata.num_rows
+    return None
+
+
+def partition_rows(path, partitions, file_format=None, min_rows=1):
+    """
+    Split the data rows of a file into at most `partitions` contiguous
+    [start, stop) ranges of at least `min_rows` rows each.
+
+    Returns (start, stop, offset) triples. For CSV, which has no row count
+    in its metadata, one pass over the raw bytes counts the rows and a
+    second finds the byte offset each range starts at; other formats get
+    None and locate their rows themselves.
+    """
+    file_format = file_format or detect_format(path)
+    total = count_rows(path, file_format)
+    if total is None and file_format == CSV:
+        with open(path, 'rb') as handle:
+            total = sum(1 for _ in _csv_record_offsets(handle)) - 1
+    if total is None:
+        # Never split a file whose rows could not be counted
+        return [(0, None, None)]
+    if total <= 0:
+        return []
+
+    partitions = max(min(partitions, total // max(min_rows, 1)), 1)
+    size, remainder = divmod(total, partitions)
+    ranges, start = [], 0
+    for index in range(partitions):
+        stop = start + size + (1 if index < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+
+    offsets = [None] * len(ranges)
+    if file_format == CSV:
+        starts = iter(enumerate(range_start for range_start, _ in ranges))
+        index, wanted = next(starts)
+        with open(path, 'rb') as handle:
+            # Record 0 is the header, so data row n is record n + 1
+            for record, offset in enumerate(_csv_record_offsets(handle)):
+                if record == wanted + 1:
+                    offsets[index] = offset
+                    index, wanted = next(starts, (None, None))
+                    if index is None:
+                        break
+    return [(start, stop, offset) for (start, stop), offset in zip(ranges, offsets)]
+
+
+def write_csv(path, destination, file_format=None, batch_size=None):
+    """
+    Copy an ingestion file to CSV in one streaming pass, so formats that
+    cannot seek to a row (xlsx) can be split by byte offset afterwards
+    """
+    header = True
+    with open(destination, 'w', newline='') as handle:
+        for batch in read_batches(path, batch_size, file_format):
+            batch.to_csv(handle, header=header, index=False)
+            header = False
+    return destination
+
+
+def _csv_record_offsets(handle):
+    """
+    Byte offset of every CSV record in a binary file, header first.
+
+    Lines inside a quoted field continue their record, and blank lines
+    are skipped as pandas skips them, so offsets line up with read_csv's
+    rows.
+    """
+    offset, in_quotes = 0, False
+    for line in handle:
+        if not in_quotes and line.strip():
+            yield offset
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        offset += len(line)
+
+
+class _HeaderAndRange(io.RawIOBase):
+    """A CSV file's header record followed by its bytes from `offset` on"""
+
+    def __init__(self, handle, offset):
+        records = _csv_record_offsets(handle)
+        next(records, None)
+        header_end = next(records, offset)
+        handle.seek(0)
+        self.header = handle.read(header_end)
+        self.handle = handle
+        handle.seek(offset)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.header:
+            size = min(len(buffer), len(self.header))
+            buffer[:size] = self.header[:size]
+            self.header = self.header[size:]
+            return size
+        return self.handle.readinto(buffer)
+
+
+def _read_xlsx(path, batch_size, start=0, stop=None):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        if header is None:
+            return
+
+        # Sheet row 1 is the header, so data row n is sheet row n + 2
+        rows = sheet.iter_rows(
+            min_row=start + 2, max_row=None if stop is None else stop + 1, values_only=True
+        )
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield pd.DataFrame.from_records(batch, columns=header).infer_objects()
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=header).infer_objects()
+    finally:
+        workbook.close()
+
+
+def _parquet_file(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError('Reading Parquet files requires the pyarrow package') from e
+    return pq.ParquetFile(path)
+
+
+def _read_parquet(path, batch_size, start=0, stop=None):
+    parquet = _parquet_file(path)
+    stop = parquet.metadata.num_rows if stop is None else stop
+
+    # Only decode the row groups that overlap the range, then trim the edges
+    row_groups, offset, first_row = [], 0, None
+    for index in range(parquet.num_row_groups):
+        group_rows = parquet.metadata.row_group(index).num_rows
+        if offset < stop and offset + group_rows > start:
+            row_groups.append(index)
+            first_row = offset if first_row is None else first_row
+        offset += group_rows
+    if not row_groups:
+        return
+
+    position = first_row
+    for batch in parquet.iter_batches(batch_size=batch_size, row_groups=row_groups):
+        lo = max(start - position, 0)
+        hi = min(stop - position, batch.num_rows)
+        position += batch.num_rows
+        if hi > lo:
+            yield batch.slice(lo, hi - lo).to_pandas()
+        if position >= stop:
+            return
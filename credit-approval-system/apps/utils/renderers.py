@@ -0,0 +1,93 @@
+"""
+JSON rendering for the hot endpoints, opted into with FAST_JSON_RENDERING.
+
+dumps() produces the same bytes as DRF's JSONRenderer under this
+project's REST_FRAMEWORK settings (compact, unicode, strict), but
+encodes through orjson when it is installed and otherwise through the
+C json encoder with a Decimal-first fallback. Everything orjson does not
+handle natively goes through DRF's encoder, so dates, lazy strings and
+the rest come out exactly as before. The one known difference: orjson
+spells floats below 1e-4 or from 1e16 up without an exponent sign
+(1e16 rather than 1e+16), far outside the amounts and rates served here.
+"""
+import json
+from decimal import Decimal
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_drf_default = JSONEncoder().default
+
+
+def _default(obj):
+    # Decimals are by far the most common non-native value in our payloads
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _drf_default(obj)
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'), default=_default)
+
+if orjson is not None:
+    # Dates and dataclasses go through _default so DRF's formatting applies
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def _escape_separators(content):
+    # JSONRenderer escapes these so the output stays a strict JavaScript subset
+    if b'\xe2\x80' in content:
+        content = content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    return content
+
+
+def dumps(data):
+    """data as JSON bytes, identical to JSONRenderer().render(data)"""
+    if orjson is not None:
+        try:
+            return _escape_separators(orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            # Integers past 64 bits and the like; the stdlib path decides
+            pass
+    return _escape_separators(_encoder.encode(data).encode())
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that renders through dumps() unless asked to indent"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or not (api_settings.UNICODE_JSON and api_settings.COMPACT_JSON and api_settings.STRICT_JSON)
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def json_response(data, status=200):
+    """An already rendered application/json response, as JSONRenderer would produce it"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def respond(request, data, status=200):
+    """
+    Response for the hot DRF views.
+
+    DRF negotiates the media type as usual. With FAST_JSON_RENDERING a
+    request it settled on JSON gets its body rendered right here by
+    dumps(), bypassing the renderer; any other media type, such as the
+    browsable API, goes through Response and its renderer.
+    """
+    if settings.FAST_JSON_RENDERING and request.accepted_renderer.format == 'json':
+        return json_response(data, status)
+    return Response(data, status=status)
@@ -0,0 +1,34 @@
+from decimal import Decimal
+from django.test import SimpleTestCase
+from apps.utils import amortization
+from apps.utils.amortization import ANNUITY_TABLE, annuity_factor, compute_annuity_factor, monthly_installment
+from apps.utils.credit_score import calculate_monthly_installment
+
+
+class AnnuityFactorTests(SimpleTestCase):
+
+    def test_grid_pairs_come_from_the_table(self):
+        amortization.cached_annuity_factor.cache_clear()
+        self.assertIs(annuity_factor(Decimal('12.50'), 24), ANNUITY_TABLE[Decimal('12.5'), 24])
+        self.assertEqual(amortization.cached_annuity_factor.cache_info().currsize, 0)
+
+    def test_off_grid_pairs_are_computed(self):
+        for rate, tenure in [(Decimal('12.3'), 24), (Decimal('30'), 12), (Decimal('10'), 90)]:
+            self.assertNotIn((rate, tenure), ANNUITY_TABLE)
+            self.assertEqual(annuity_factor(rate, tenure), compute_annuity_factor(rate, tenure))
+        self.assertIsNone(annuity_factor(Decimal('0'), 12))
+
+    def test_table_matches_the_computed_factor(self):
+        for (rate, tenure), factor in ANNUITY_TABLE.items():
+            self.assertEqual(factor, compute_annuity_factor(rate, tenure))
+
+
+class CalculateMonthlyInstallmentTests(SimpleTestCase):
+
+    def test_result_is_not_rounded(self):
+        unrounded = calculate_monthly_installment(Decimal('500000'), 12, 12)
+        self.assertNotEqual(unrounded, unrounded.quantize(Decimal('0.01')))
+        self.assertEqual(unrounded.quantize(Decimal('0.01')), monthly_installment(500000, 12, 12))
+
+    def test_zero_rate_divides_the_principal(self):
+        self.assertEqual(calculate_monthly_installment(Decimal('1000'), 0, 3), Decimal('1000') / 3)
@@ -0,0 +1,69 @@
+from datetime import date
+from unittest import mock
+import pandas as pd
+from django.test import TestCase
+from apps.customers.models import Customer
+from apps.loans.models import Loan
+from apps.utils.data_ingestion import load_customers, load_loans
+
+CUSTOMERS = pd.DataFrame([
+    {'customer_id': customer_id, 'first_name': 'Test', 'last_name': f'Customer{customer_id}', 'age': 40,
+     'phone_number': 9000000000 + customer_id, 'monthly_salary': 50000, 'approved_limit': 1800000,
+     'current_debt': 0}
+    for customer_id in (1, 2, 3)
+])
+LOANS = pd.DataFrame([
+    {'customer_id': 1 + loan_id % 3, 'loan_id': loan_id, 'loan_amount': 100000 + loan_id, 'tenure': 12,
+     'interest_rate': 12, 'monthly_repayment': 8885, 'emis_paid_on_time': 12,
+     'start_date': '2030-01-01', 'end_date': '2031-01-01'}
+    for loan_id in range(1, 6)
+])
+
+
+class IngestionCountTests(TestCase):
+    """Only rows that were actually written are counted as created or updated"""
+
+    def setUp(self):
+        load_customers([CUSTOMERS])
+        self.first_load = load_loans([LOANS])
+
+    def test_first_load_creates_every_row(self):
+        self.assertEqual(self.first_load['loans_created'], 5)
+        self.assertEqual(Loan.objects.count(), 5)
+
+    def test_unchanged_file_writes_nothing(self):
+        customers = load_customers([CUSTOMERS])
+        loans = load_loans([LOANS])
+        self.assertEqual((customers['customers_created'], customers['customers_updated']), (0, 0))
+        self.assertEqual(customers['customers_unchanged'], 3)
+        self.assertEqual((loans['loans_created'], loans['loans_updated']), (0, 0))
+        self.assertEqual(loans['loans_unchanged'], 5)
+
+    def test_changed_row_is_updated(self):
+        changed = LOANS.copy()
+        changed.loc[changed['loan_id'] == 3, 'emis_paid_on_time'] = 7
+        loans = load_loans([changed])
+        self.assertEqual((loans['loans_created'], loans['loans_updated'], loans['loans_unchanged']), (0, 1, 4))
+        self.assertEqual(Loan.objects.get(pk=3).emis_paid_on_time, 7)
+        self.assertEqual(Customer.objects.get(pk=1).credit_profile.emis_paid_on_time, 7)
+
+    def test_loan_inserted_after_the_hash_lookup_is_not_counted_as_created(self):
+        # A loan booked through the API takes one of the ids right after the chunk looked them up
+        Loan.objects.create(
+            loan_id=101, customer_id=2, loan_amount=5000, tenure=6, interest_rate=10,
+            monthly_payment=858, start_date=date(2030, 1, 1), end_date=date(2030, 7, 1),
+        )
+        real_filter = Loan.objects.filter
+        lookups = []
+
+        def filter_before_the_insert(*args, **kwargs):
+            lookups.append(kwargs)
+            queryset = real_filter(*args, **kwargs)
+            return queryset.exclude(pk=101) if len(lookups) == 1 else queryset
+
+        with mock.patch.object(Loan.objects, 'filter', side_effect=filter_before_the_insert):
+            loans = load_loans([LOANS.assign(loan_id=LOANS['loan_id'] + 100)])
+
+        self.assertEqual((loans['loans_created'], loans['loans_updated']), (4, 1))
+        self.assertEqual(Loan.objects.get(pk=101).loan_amount, 100001)
+        self.assertEqual(Loan.objects.count(), 10)
@@ -0,0 +1,91 @@
+from unittest import mock
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from apps.customers.models import Customer
+from apps.loans.tests.helpers import clear_caches, create_customer
+from apps.utils import db_router
+from apps.utils.cache import bump_versions, customer_version_key, get_cache
+from apps.utils.db_router import ReplicaRouter, replica_reads
+
+REPLICAS = ('replica_0', 'replica_1')
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Which alias reads and writes go to. A TestCase would wrap every test in
+    a transaction, and reads inside one always stay on the primary.
+    """
+    databases = {'default', *REPLICAS}
+
+    def setUp(self):
+        clear_caches()
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        self.healthy = set(REPLICAS)
+        patcher = mock.patch.object(db_router, '_check', side_effect=lambda alias: alias in self.healthy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_outside_replica_reads_use_the_primary(self):
+        self.assertEqual(Customer.objects.all().db, 'default')
+
+    def test_reads_inside_replica_reads_use_a_replica(self):
+        customer = create_customer()
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica_0']) as replica_0, \
+                CaptureQueriesContext(connections['replica_1']) as replica_1:
+            with replica_reads():
+                self.assertIn(Customer.objects.all().db, REPLICAS)
+                self.assertEqual(Customer.objects.get(pk=customer.pk).first_name, 'Asha')
+        self.assertEqual(len(primary), 0)
+        self.assertEqual(len(replica_0) + len(replica_1), 1)
+
+    def test_writes_go_to_the_primary_and_pin_the_rest_of_the_block(self):
+        with replica_reads():
+            self.assertIn(Customer.objects.all().db, REPLICAS)
+            self.assertEqual(ReplicaRouter().db_for_write(Customer), 'default')
+            self.assertEqual(Customer.objects.all().db, 'default')
+        with replica_reads():
+            self.assertIn(Customer.objects.all().db, REPLICAS)
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(Customer.objects.all().db, 'default')
+
+    def test_recent_write_marker_pins_reads_to_the_primary(self):
+        written, untouched = customer_version_key(1), customer_version_key(2)
+        bump_versions([written])
+        with replica_reads([written]):
+            self.assertEqual(Customer.objects.all().db, 'default')
+        with replica_reads([untouched]):
+            self.assertIn(Customer.objects.all().db, REPLICAS)
+
+        get_cache().delete_many([f'recent_write:{written}'])
+        with replica_reads([written]):
+            self.assertIn(Customer.objects.all().db, REPLICAS)
+
+    def test_unhealthy_replicas_are_skipped(self):
+        self.healthy = {'replica_1'}
+        with replica_reads():
+            for _ in range(20):
+                self.assertEqual(Customer.objects.all().db, 'replica_1')
+
+    def test_no_healthy_replica_falls_back_to_the_primary(self):
+        self.healthy = set()
+        with replica_reads():
+            self.assertEqual(Customer.objects.all().db, 'default')
+
+    def test_health_is_rechecked_after_the_interval(self):
+        with self.settings(DB_REPLICA_HEALTH_INTERVAL=3600):
+            self.assertTrue(db_router.replica_healthy('replica_0'))
+            self.healthy = set()
+            self.assertTrue(db_router.replica_healthy('replica_0'))
+        with self.settings(DB_REPLICA_HEALTH_INTERVAL=0):
+            self.assertFalse(db_router.replica_healthy('replica_0'))
+
+    def test_migrations_only_run_on_the_primary(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'customers'))
+        for alias in REPLICAS:
+            self.assertFalse(router.allow_migrate(alias, 'customers'))
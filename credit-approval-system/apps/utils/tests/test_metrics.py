@@ -0,0 +1,47 @@
+from django.test import AsyncClient, TestCase
+from apps.customers.models import Customer
+from apps.loans.tests.helpers import clear_caches, create_customer
+from apps.utils.metrics import DB_DURATION, DB_QUERIES
+
+
+def recorded(registry, view):
+    """Observations and their sum for one view so far"""
+    histogram = registry.histograms.get((view,))
+    if histogram is None:
+        return 0, 0.0
+    buckets, total = histogram.snapshot()
+    return buckets[-1][1], total
+
+
+class AsgiQueryMetricsTests(TestCase):
+    """Queries run in sync_to_async threads still count towards their request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+
+    def setUp(self):
+        clear_caches()
+
+    async def assert_queries_recorded(self, path, view):
+        requests_before, queries_before = recorded(DB_QUERIES, view)
+        _, seconds_before = recorded(DB_DURATION, view)
+        response = await AsyncClient().get(path)
+        self.assertEqual(response.status_code, 200)
+
+        requests, queries = recorded(DB_QUERIES, view)
+        _, seconds = recorded(DB_DURATION, view)
+        self.assertEqual(requests, requests_before + 1)
+        self.assertGreater(queries, queries_before)
+        self.assertGreater(seconds, seconds_before)
+
+    async def test_async_view_records_its_queries(self):
+        await self.assert_queries_recorded(f'/api/async/view-loans/{self.customer.pk}/', 'view_loans_async')
+
+    async def test_sync_view_under_asgi_records_its_queries(self):
+        await self.assert_queries_recorded(f'/api/view-loans/{self.customer.pk}/', 'view_loans')
+
+    def test_queries_outside_a_request_are_not_counted(self):
+        _, before = recorded(DB_QUERIES, 'view_loans')
+        Customer.objects.count()
+        self.assertEqual(recorded(DB_QUERIES, 'view_loans')[1], before)
@@ -0,0 +1,140 @@
+import json
+import time
+import uuid
+from unittest import mock
+from django.test import AsyncClient, Client, SimpleTestCase
+from apps.utils import progress
+from apps.utils.progress import MemoryChannel
+
+
+def parse_frames(body):
+    """(id, event, data) of every event frame in an SSE body, skipping comments and retry"""
+    frames = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            frames.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return frames
+
+
+class MemoryChannelTests(SimpleTestCase):
+
+    def setUp(self):
+        self.channel = MemoryChannel(ttl=60, max_jobs=2)
+
+    def test_read_replays_from_the_start_and_resumes_after_an_id(self):
+        for step in range(3):
+            self.channel.publish('job', 'progress', {'step': step})
+        events = self.channel.read('job', timeout=0)
+        self.assertEqual([data['step'] for _, _, data in events], [0, 1, 2])
+        resumed = self.channel.read('job', events[0][0], timeout=0)
+        self.assertEqual([data['step'] for _, _, data in resumed], [1, 2])
+        self.assertEqual(self.channel.read('job', events[-1][0], timeout=0), [])
+
+    def test_jobs_are_forgotten_after_the_ttl(self):
+        with mock.patch('apps.utils.progress.time.monotonic', return_value=1000.0):
+            self.channel.publish('old', 'progress', {})
+            self.channel.increment('old', 'loans', {'read': 5})
+        with mock.patch('apps.utils.progress.time.monotonic', return_value=1061.0):
+            self.channel.publish('new', 'progress', {})
+        self.assertEqual(self.channel.read('old', timeout=0), [])
+        self.assertEqual(self.channel.counters_for('old', 'loans'), {})
+        self.assertEqual(len(self.channel.read('new', timeout=0)), 1)
+
+    def test_least_recently_written_jobs_go_past_max_jobs(self):
+        for job_id in ('a', 'b'):
+            self.channel.publish(job_id, 'progress', {})
+        # Writing to a keeps it; b is now the least recently written
+        self.channel.increment('a', 'loans', {'read': 1})
+        self.channel.publish('c', 'progress', {})
+        self.assertEqual(self.channel.read('b', timeout=0), [])
+        self.assertEqual(len(self.channel.read('a', timeout=0)), 1)
+        self.assertEqual(len(self.channel.read('c', timeout=0)), 1)
+
+    def test_set_once_keeps_the_first_values(self):
+        self.channel.set_once('job', 'loans', {'total': 10, 'started_ms': 1})
+        counters = self.channel.set_once('job', 'loans', {'total': 20, 'started_ms': 2})
+        self.assertEqual(counters, {'total': 10, 'started_ms': 1})
+
+    def test_parse_id_rejects_ids_of_another_backend(self):
+        self.assertEqual(self.channel.parse_id('12'), '12')
+        for value in (None, '', '1-0', 'abc'):
+            self.assertIsNone(self.channel.parse_id(value))
+
+
+class PartitionRetryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.channel = MemoryChannel()
+        patcher = mock.patch.object(progress, '_channel', self.channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retried_partition_is_not_counted_twice(self):
+        progress.stage_started('job', 'loans', 20, 2)
+        progress.report_progress('job', 'loans', read=10, written=10, partition=10)
+        for _attempt in range(2):
+            progress.partition_started('job', 'loans', 0)
+            progress.report_progress('job', 'loans', read=6, written=5, rejected=1, partition=0)
+
+        counters = self.channel.counters_for('job', 'loans')
+        self.assertEqual(
+            {field: counters[field] for field in progress.PROGRESS_FIELDS},
+            {'read': 16, 'validated': 15, 'written': 15, 'rejected': 1},
+        )
+        self.assertEqual(counters['total'], 20)
+
+
+class SseTests(SimpleTestCase):
+
+    def setUp(self):
+        self.channel = MemoryChannel()
+        patcher = mock.patch.object(progress, '_channel', self.channel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.job_id = str(uuid.uuid4())
+        progress.publish(self.job_id, 'stage', {'stage': 'loans'})
+        progress.publish(self.job_id, 'progress', {'read': 10})
+        progress.publish(self.job_id, 'complete', {'status': 'SUCCESS'})
+
+    def test_events_are_framed_and_the_stream_ends_after_the_final_event(self):
+        frames = list(progress.sse_events(self.job_id, heartbeat=0))
+        self.assertTrue(all(frame.endswith('\n\n') for frame in frames))
+        events = parse_frames(''.join(frames))
+        self.assertEqual([event for _, event, _ in events], ['stage', 'progress', 'complete'])
+        self.assertEqual(events[1][2], {'read': 10})
+
+    def test_idle_stream_sends_heartbeats(self):
+        frames = list(progress.sse_events('idle', heartbeat=0, max_seconds=0.05))
+        self.assertEqual(frames[0], 'retry: 1000\n\n')
+        self.assertTrue(frames[1:])
+        self.assertEqual(set(frames[1:]), {': keep-alive\n\n'})
+
+    def test_idle_stream_ends_at_max_seconds_despite_a_longer_heartbeat(self):
+        started = time.monotonic()
+        list(progress.sse_events('idle', heartbeat=10, max_seconds=0.1))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_wsgi_view_closes_the_stream_after_the_configured_lifetime(self):
+        with self.settings(INGESTION_PROGRESS_WSGI_MAX_SECONDS=0):
+            response = Client().get(f'/api/ingestion-progress/{uuid.uuid4()}/')
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body, 'retry: 1000\n\n')
+
+    def test_view_resumes_from_last_event_id(self):
+        first_id = self.channel.read(self.job_id, timeout=0)[0][0]
+        response = Client().get(f'/api/ingestion-progress/{self.job_id}/', HTTP_LAST_EVENT_ID=first_id)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = parse_frames(b''.join(response.streaming_content).decode())
+        self.assertEqual([event for _, event, _ in events], ['progress', 'complete'])
+
+    def test_view_replays_everything_for_a_foreign_id(self):
+        response = Client().get(f'/api/ingestion-progress/{self.job_id}/?last_event_id=1-0')
+        events = parse_frames(b''.join(response.streaming_content).decode())
+        self.assertEqual(len(events), 3)
+
+    async def test_asgi_view_streams_an_async_iterator(self):
+        response = await AsyncClient().get(f'/api/ingestion-progress/{self.job_id}/')
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([event for _, event, _ in parse_frames(body)], ['stage', 'progress', 'complete'])
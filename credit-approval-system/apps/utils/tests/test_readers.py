@@ -0,0 +1,65 @@
+import os
+import re
+import tempfile
+import zipfile
+import pandas as pd
+from django.test import SimpleTestCase
+from apps.utils.readers import CSV, XLSX, count_rows, partition_rows, read_batches, write_csv
+
+
+class PartitionedCsvTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.frame = pd.DataFrame({
+            'customer_id': range(1, 101),
+            # Quoted fields spanning lines must not be taken for row boundaries
+            'note': [f'"line one\nline {i}"' if i % 7 == 0 else f'row {i}' for i in range(1, 101)],
+        })
+        self.path = os.path.join(self.directory, 'customers.csv')
+        self.frame.to_csv(self.path, index=False)
+        with open(self.path, 'a') as handle:
+            handle.write('\n')
+
+    def read(self, path, ranges, file_format):
+        return pd.concat(
+            batch for start, stop, offset in ranges
+            for batch in read_batches(path, 8, file_format, start, stop, offset)
+        ).reset_index(drop=True)
+
+    def test_partitions_seek_to_their_rows(self):
+        ranges = partition_rows(self.path, 4, CSV, min_rows=10)
+        self.assertEqual([(start, stop) for start, stop, _ in ranges], [(0, 25), (25, 50), (50, 75), (75, 100)])
+        self.assertTrue(all(offset is not None for _, _, offset in ranges))
+        pd.testing.assert_frame_equal(self.read(self.path, ranges, CSV), self.frame)
+
+    def test_offset_read_matches_skipping_rows(self):
+        (_, _, _), (start, stop, offset) = partition_rows(self.path, 2, CSV)
+        seeked = pd.concat(read_batches(self.path, 8, CSV, start, stop, offset))
+        skipped = pd.concat(read_batches(self.path, 8, CSV, start, stop))
+        pd.testing.assert_frame_equal(seeked, skipped)
+
+    def test_xlsx_copied_to_csv_partitions_like_the_original(self):
+        xlsx = os.path.join(self.directory, 'customers.xlsx')
+        self.frame.to_excel(xlsx, index=False)
+        copy = write_csv(xlsx, os.path.join(self.directory, 'copy.csv'), XLSX, batch_size=30)
+        ranges = partition_rows(copy, 3, CSV)
+        pd.testing.assert_frame_equal(self.read(copy, ranges, CSV), self.frame)
+
+    def test_xlsx_without_a_dimension_record_is_counted_from_its_rows(self):
+        xlsx = os.path.join(self.directory, 'customers.xlsx')
+        self.frame.to_excel(xlsx, index=False)
+        stripped = os.path.join(self.directory, 'no_dimension.xlsx')
+        with zipfile.ZipFile(xlsx) as source, zipfile.ZipFile(stripped, 'w') as target:
+            for item in source.infolist():
+                data = source.read(item)
+                if item.filename.startswith('xl/worksheets/'):
+                    data = re.sub(rb'<dimension[^>]*/>', b'', data)
+                target.writestr(item, data)
+
+        self.assertEqual(count_rows(stripped, XLSX), 100)
+        ranges = partition_rows(stripped, 4, XLSX, min_rows=10)
+        self.assertEqual(ranges, [(0, 25, None), (25, 50, None), (50, 75, None), (75, 100, None)])
+        pd.testing.assert_frame_equal(self.read(stripped, ranges, XLSX), self.frame)
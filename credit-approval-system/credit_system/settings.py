@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.utils.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,18 +57,69 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'credit_system.wsgi.application'
 
-# Database - Using SQLite for immediate testing
+# Database - persistent connections by default; DB_POOL_MAX_SIZE > 0 switches to a
+# bounded per-process pool shared by all threads, which is what ASGI and Celery want
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'credit_system',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'db',  # This should match the service name in docker-compose.yml
-        'PORT': '5432',
+        'ENGINE': 'apps.utils.pooled_postgresql',
+        'NAME': os.environ.get('DB_NAME', 'credit_system'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', 'db'),  # This should match the service name in docker-compose.yml
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Seconds a thread keeps its connection open; pooled connections go back to the pool instead
+        'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Ping a persistent connection before reusing it in a new request
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            # Seconds to wait for a free connection before failing the request
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Idle seconds before a pooled connection is closed, and before it is pinged on checkout
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+        } if DB_POOL_MAX_SIZE else None,
     }
 }
 
+# Read replicas - comma-separated hosts, each served as alias replica_<n> with the
+# primary's other settings. Only blocks wrapped in replica_reads use them.
+DATABASE_REPLICAS = []
+for index, host in enumerate(h for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_ROUTERS = ['apps.utils.db_router.ReplicaRouter']
+# Seconds a written customer or loan is read from the primary, covering replica lag
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+# Seconds between connection checks of each replica; unhealthy ones are skipped
+DB_REPLICA_HEALTH_INTERVAL = int(os.environ.get('DB_REPLICA_HEALTH_INTERVAL', 10))
+
+# Cache - Redis when REDIS_URL is set (see docker-compose.yml), in-process otherwise
+REDIS_URL = os.environ.get('REDIS_URL')
+API_CACHE_ALIAS = 'default'
+API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', 300))
+API_CACHE_MAX_ENTRIES = int(os.environ.get('API_CACHE_MAX_ENTRIES', 10000))
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': API_CACHE_TTL,
+            'KEY_PREFIX': 'credit',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'TIMEOUT': API_CACHE_TTL,
+            'OPTIONS': {'MAX_ENTRIES': API_CACHE_MAX_ENTRIES},
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -91,8 +144,68 @@ USE_TZ = True
 STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Render JSON through apps.utils.renderers (orjson when installed) with the same
+# bytes as DRF's renderer; the hot views then also skip content negotiation
+FAST_JSON_RENDERING = os.environ.get('FAST_JSON_RENDERING', '0') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
-} 
\ No newline at end of file
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.utils.renderers.FastJSONRenderer' if FAST_JSON_RENDERING else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Maximum number of quotes accepted by the batch eligibility endpoint
+ELIGIBILITY_BATCH_MAX_SIZE = int(os.environ.get('ELIGIBILITY_BATCH_MAX_SIZE', 5000))
+
+# Maximum number of applications accepted by the batch loan creation endpoint
+CREATE_LOANS_BATCH_MAX_SIZE = int(os.environ.get('CREATE_LOANS_BATCH_MAX_SIZE', 1000))
+
+# Eligibility decisions kept per process for re-sent quotes (LRU)
+ELIGIBILITY_DECISION_CACHE_SIZE = int(os.environ.get('ELIGIBILITY_DECISION_CACHE_SIZE', 10000))
+
+# Rows per ingestion chunk; each chunk is resolved and written in one transaction
+INGESTION_CHUNK_SIZE = int(os.environ.get('INGESTION_CHUNK_SIZE', 5000))
+
+# Row-range partitions each ingestion file is split into across Celery workers
+INGESTION_PARTITIONS = int(os.environ.get('INGESTION_PARTITIONS', 4))
+
+# Seconds an ingestion progress stream stays open when served under WSGI,
+# where it holds a worker thread; clients then reconnect with Last-Event-ID
+INGESTION_PROGRESS_WSGI_MAX_SECONDS = int(os.environ.get('INGESTION_PROGRESS_WSGI_MAX_SECONDS', 30))
+
+# Loan ids reserved per worker process at a time by the id allocator
+LOAN_ID_BLOCK_SIZE = int(os.environ.get('LOAN_ID_BLOCK_SIZE', 20))
+
+# view_loans page size: default when ?page_size= is absent, and hard cap
+VIEW_LOANS_PAGE_SIZE = int(os.environ.get('VIEW_LOANS_PAGE_SIZE', 100))
+VIEW_LOANS_MAX_PAGE_SIZE = int(os.environ.get('VIEW_LOANS_MAX_PAGE_SIZE', 500))
+
+# Celery - chords need a result backend, both default to the Redis instance
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL or 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+
+# Seconds a create_loan Idempotency-Key and its stored response are kept
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Celery beat - loans past their end date leave customers' current debt at
+# LOAN_ROLL_OFF_HOUR (UTC) and every customer is rescored at
+# PORTFOLIO_RESCORE_HOUR, by default after that day's roll-off; expired
+# idempotency keys are purged hourly
+CELERY_BEAT_SCHEDULE = {
+    'roll-off-matured-loans': {
+        'task': 'apps.loans.tasks.roll_off_matured_loans',
+        'schedule': crontab(hour=int(os.environ.get('LOAN_ROLL_OFF_HOUR', 0)), minute=5),
+    },
+    'rescore-portfolio': {
+        'task': 'apps.loans.tasks.rescore_portfolio',
+        'schedule': crontab(hour=int(os.environ.get('PORTFOLIO_RESCORE_HOUR', 1)), minute=5),
+    },
+    'purge-idempotency-keys': {
+        'task': 'apps.loans.tasks.purge_idempotency_keys',
+        'schedule': crontab(minute=35),
+    },
+}
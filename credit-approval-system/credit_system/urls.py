@@ -1,16 +1,27 @@
 # credit_system/urls.py
 from django.contrib import admin
 from django.urls import path
-from apps.loans import views
+from apps.loans import async_views, views
+from apps.utils.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/register/', views.register_customer, name='register'),
     path('api/check-eligibility/', views.check_eligibility, name='check_eligibility'),
+    path('api/check-eligibility/batch/', views.check_eligibility_batch, name='check_eligibility_batch'),
     path('api/create-loan/', views.create_loan, name='create_loan'),
+    path('api/create-loans/batch/', views.create_loans_batch, name='create_loans_batch'),
     path('api/view-loan/<int:loan_id>/', views.view_loan, name='view_loan'),
+    path('api/view-loan/<int:loan_id>/schedule/', views.view_loan_schedule, name='view_loan_schedule'),
     path('api/view-loans/<int:customer_id>/', views.view_loans, name='view_loans'),
+    # Async versions of the read endpoints, for ASGI deployments
+    path('api/async/check-eligibility/', async_views.check_eligibility, name='check_eligibility_async'),
+    path('api/async/view-loan/<int:loan_id>/', async_views.view_loan, name='view_loan_async'),
+    path('api/async/view-loans/<int:customer_id>/', async_views.view_loans, name='view_loans_async'),
     # Data ingestion endpoints
     path('api/ingest-data/', views.ingest_data, name='ingest_data'),
     path('api/ingestion-status/', views.ingestion_status, name='ingestion_status'),
+    path('api/ingestion-progress/<uuid:job_id>/', views.ingestion_progress, name='ingestion_progress'),
+    # Prometheus scrape endpoint
+    path('api/metrics', metrics_view, name='metrics'),
 ]